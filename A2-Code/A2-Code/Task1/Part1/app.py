@@ -1,10 +1,12 @@
 from flask import Flask, request, jsonify, render_template
 import hashlib
-import json
 import os
 import datetime
 import time 
-from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES, MAX_FAULTY_NODES
+from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES, MAX_FAULTY_NODES, RSA_CRT_CHECK, STORAGE_BACKEND
+from config import DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE
+from storage import open_ledger, SQLiteLedger, SQLRecordIndex
+from record_index import RecordIndex
 
 app = Flask(__name__)
 
@@ -12,6 +14,12 @@ F = MAX_FAULTY_NODES  # Max faulty nodes (F=1 for 4 nodes)
 PREPARE_THRESHOLD = 2 * F  # 2F prepare messages needed
 COMMIT_THRESHOLD = 2 * F + 1  # 2F+1 commit messages needed (3 for F=1)
 
+def crt_pow(m, p, q, dp, dq, qinv):
+    """m^d mod pq via the Chinese Remainder Theorem (dp = d mod p-1, dq = d mod q-1)"""
+    m1 = pow(m, dp, p)
+    m2 = pow(m, dq, q)
+    return m2 + ((qinv * (m1 - m2)) % p) * q
+
 class RSANode:
     def __init__(self, name, p, q, e):
         self.name = name
@@ -21,6 +29,10 @@ class RSANode:
         self.n = p * q
         self.phi = (p - 1) * (q - 1)
         self.d = pow(e, -1, self.phi)
+        # CRT parameters, computed once, so signing works mod p and q separately
+        self.dp = self.d % (p - 1)
+        self.dq = self.d % (q - 1)
+        self.qinv = pow(q, -1, p)
         
         self.view_number = 0  # Current view
         self.sequence_number = 0  # Current sequence
@@ -36,7 +48,10 @@ class RSANode:
         if h >= self.n:
             h = h % self.n
             
-        return pow(h, self.d, self.n) # return signature val
+        signature = crt_pow(h, self.p, self.q, self.dp, self.dq, self.qinv)
+        if RSA_CRT_CHECK and signature != pow(h, self.d, self.n):
+            raise ValueError(f"CRT signature mismatch for node {self.name}")
+        return signature # return signature val
     
     def verify(self, message, signature, signer_name):
         # Get the signer's public key from  config
@@ -71,22 +86,44 @@ class RSANode:
 # Initialise all nodes
 nodes = {name: RSANode(name, params.p, params.q, params.e) for name, params in NODES.items()}
 
+# DB helpers
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_DIR = os.path.join(BASE_DIR, "database")
+
+# One ledger per node in the configured storage backend and durability mode,
+# seeded from node_x.json on first run
+ledgers = {name: open_ledger(name, DB_DIR, STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE)
+           for name in nodes}
+
+def build_index(node, records=None):
+    # SQLite answers these lookups from its own indexes
+    if isinstance(ledgers[node], SQLiteLedger):
+        return SQLRecordIndex(ledgers[node])
+    return RecordIndex(ledgers[node].records() if records is None else records)
+
+# Per-node substring and sequence indexes, rebuilt from the ledgers on
+# startup and kept current by append_db/save_db so lookups never go to disk
+INDEXES = {name: build_index(name) for name in ledgers}
+
 def get_db(node):
-    os.makedirs("Task1/Part1/database", exist_ok=True)
-    path = os.path.join("Task1", "Part1", "database", f"node_{node.lower()}.json")
-    if not os.path.exists(path):
-        return {"records": []}
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except:
-        return {"records": []}
+    return ledgers[node].export()
 
 def save_db(node, data):
-    os.makedirs("Task1/Part1/database", exist_ok=True)
-    path = os.path.join("Task1", "Part1", "database", f"node_{node.lower()}.json")
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=1)
+    ledgers[node].replace(data["records"])
+    INDEXES[node] = build_index(node, data["records"])
+
+def append_db(node, record):
+    # Committing a record is a single append, independent of ledger size;
+    # returns the ticket to acknowledge it with
+    ticket = ledgers[node].append(record)
+    INDEXES[node].add(record)
+    return ticket
+
+def wait_durable(tickets):
+    """Acknowledge commits: True once each node's records up to its ticket
+    ({node: ticket}) are on disk; always False in relaxed mode or when
+    nothing was appended"""
+    return bool(tickets) and all([ledgers[node].wait_durable(ticket) for node, ticket in tickets.items()])
 
 def count_approvals(verification_results, proposer):
    #Count explicit verifications + implicit proposer verification
@@ -221,8 +258,7 @@ def commit():
         commit_count = len(nodes[node].commit_messages.get(sequence, {}))
         if commit_count >= COMMIT_THRESHOLD:
             # Persist to database
-            db = get_db(node)
-            db["records"].append({
+            tickets = {node: append_db(node, {
                 "record": next(m['record'] for m in nodes[node].message_log 
                              if m['sequence'] == sequence),
                 "signature": next(m['signature'] for m in nodes[node].message_log 
@@ -230,9 +266,8 @@ def commit():
                 "status": "COMMITTED",
                 "sequence": sequence,
                 "view": view
-            })
-            save_db(node, db)
-            return jsonify({"status": "COMMITTED"})
+            })}
+            return jsonify({"status": "COMMITTED", "durable": wait_durable(tickets)})
     
     return jsonify({"status": "PENDING"})
 
@@ -245,8 +280,7 @@ def status():
     node = request.args.get("node", list(NODES.keys())[0])
     
     # Check if request was committed
-    db = get_db(node)
-    committed = any(r.get("sequence") == sequence for r in db["records"])
+    committed = INDEXES[node].has_sequence(sequence)
     
     if committed:
         return jsonify({"state": "COMMITTED"})
@@ -285,6 +319,7 @@ def submit():
     
     # Simulate verification by other nodes
     approvals = 0
+    tickets = {}  # {node: ticket of its append}
     verification = {}
     verification_details = {}  # <-- This line was missing and causing the error
     for name, verifier in nodes.items():
@@ -303,25 +338,21 @@ def submit():
             if verified:
                 approvals += 1
                 # Update each node's simulated database
-                db = get_db(name)
-                db["records"].append({
+                tickets[name] = append_db(name, {
                     "record": record,
                     "signature": str(signature),
                     "verified_by": name
                 })
-                save_db(name, db)
     
     # Check consensus
     required_approvals = int(len(nodes) * CONSENSUS_THRESHOLD)
     if approvals >= required_approvals:
         # Update proposer's database
-        db = get_db(node)
-        db["records"].append({
+        tickets[node] = append_db(node, {
             "record": record,
             "signature": str(signature),
             "status": "COMMITTED"
         })
-        save_db(node, db)
         status = "COMMITTED"
     else:
         status = "REJECTED"
@@ -339,7 +370,8 @@ def submit():
     },
         # "required": required_approvals,
         "status": status,
-        "propagated": status == "COMMITTED"  # New field
+        "propagated": status == "COMMITTED",  # New field
+        "durable": wait_durable(tickets)
         
     })
     
@@ -352,8 +384,7 @@ def search_record():
     found_in_nodes = {}
     
     for node_name in nodes:
-        db = get_db(node_name)
-        matching_records = [r for r in db.get("records", []) if record_number in r.get("record", "")]
+        matching_records = INDEXES[node_name].search(record_number)
         if matching_records:
             found_in_nodes[node_name] = matching_records
     
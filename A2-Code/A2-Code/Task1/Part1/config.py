@@ -1,4 +1,5 @@
 """Hardcoded RSA keys"""
+import os
 
 class NodeConfig:
     def __init__(self, p, q, e):
@@ -38,4 +39,22 @@ TOTAL_NODES = 4
 CONSENSUS_PROTOCOL = "PBFT"
 MAX_FAULTY_NODES = 1  # f=1 for 4 nodes # Ref: https://www.geeksforgeeks.org/minimum-number-of-nodes-to-achieve-byzantine-fault-tolerance/
 REQUIRED_APPROVALS = 2 * MAX_FAULTY_NODES + 1  # 3 for f=1
-CONSENSUS_THRESHOLD = .75  # Honest Nodes ≥ (Total Nodes / 3) * 2 --> (4/3) * 2 --> (8/3) --> 2.667 out of 4 --> Honest Nodes ≥ 2.66 out of 4 --> 3 out of 4 (round up) --> 0.75
\ No newline at end of file
+CONSENSUS_THRESHOLD = .75  # Honest Nodes ≥ (Total Nodes / 3) * 2 --> (4/3) * 2 --> (8/3) --> 2.667 out of 4 --> Honest Nodes ≥ 2.66 out of 4 --> 3 out of 4 (round up) --> 0.75
+
+# Recompute every CRT signature/decryption the plain pow(m, d, n) way and
+# raise on mismatch. Slow; only for validating the CRT path.
+RSA_CRT_CHECK = False
+
+# Where node ledgers are stored: "segment" (append-only node_x.ledger files)
+# or "sqlite" (one WAL-mode SQLite database, queried through its indexes)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "segment")
+
+# When a commit counts as durable: "strict" fsyncs every commit, "group"
+# fsyncs straight away when no fsync is running and otherwise lets the
+# commits that arrive meanwhile share the next one, "relaxed" leaves them in
+# the OS page cache. Group mode also syncs records nobody waits on after
+# GROUP_COMMIT_INTERVAL seconds or GROUP_COMMIT_SIZE records. Submits are
+# only acknowledged as durable once their fsync has finished.
+DURABILITY = os.environ.get("DURABILITY", "group")
+GROUP_COMMIT_INTERVAL = 0.005
+GROUP_COMMIT_SIZE = 64
@@ -0,0 +1,60 @@
+"""In-memory indexes over a node's records for /search_record and /status.
+
+Substring search uses a trigram index: every 3-character window of a
+record's text maps to the ledger positions of the records containing it.
+Any record that contains the query contains all of the query's trigrams. So
+only the records listed under the query's rarest trigram need the real
+substring test. Queries shorter than a trigram match a large share of
+the ledger anyway and are answered by a scan. A second index maps sequence
+numbers to the records committed under them.
+"""
+import threading
+from array import array
+from collections import defaultdict
+
+GRAM = 3
+
+
+def text_of(record):
+    text = record.get("record", "") if isinstance(record, dict) else ""
+    return text if isinstance(text, str) else ""
+
+
+def grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class RecordIndex:
+    def __init__(self, records=()):
+        self.records = []  # Every record in ledger order
+        self.postings = defaultdict(lambda: array("I"))  # {trigram: [ledger position, ...]}, ascending
+        self.by_sequence = defaultdict(list)  # {sequence: [record, ...]}
+        self.lock = threading.Lock()  # Serialises writers; readers never see a posting before its record
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        """Index one newly appended record"""
+        with self.lock:
+            position = len(self.records)
+            self.records.append(record)
+            for gram in grams(text_of(record)):
+                self.postings[gram].append(position)
+            self.by_sequence[record.get("sequence")].append(record)
+
+    def search(self, query):
+        """Records whose text contains query, in ledger order"""
+        if len(query) < GRAM:
+            return [r for r in self.records[:] if query in text_of(r)]
+        lists = [self.postings.get(gram) for gram in grams(query)]
+        if any(positions is None for positions in lists):
+            return []
+        records = self.records
+        rarest = min(lists, key=len)
+        return [records[p] for p in rarest if query in text_of(records[p])]
+
+    def has_sequence(self, sequence):
+        return sequence in self.by_sequence
+
+    def __len__(self):
+        return len(self.records)
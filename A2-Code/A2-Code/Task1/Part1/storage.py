@@ -0,0 +1,10 @@
+"""The node ledgers this app uses, from the shared node_ledger package
+(A2-Code/node_ledger), so every app runs the same storage code."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from node_ledger.storage import open_ledger, SQLiteLedger, SQLRecordIndex  # noqa: E402,F401
@@ -1,16 +1,32 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, g, Response, stream_with_context
 import hashlib
 import json
 import os
 import datetime
-from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES
+import time
+from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES, RSA_CRT_CHECK
+from config import PIPELINE_WINDOW, QUERY_PAGE_SIZE, QUERY_MAX_PAGE_SIZE, COMMIT_WAIT_TIMEOUT, COMMIT_STREAM_KEEPALIVE, COMMIT_NOTIFY_HISTORY
+from config import CLIENT_REPLY_WAIT, STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE, FAST_PATH
+from storage import open_ledger, SQLiteLedger, SQLItemIndex
+from item_index import ItemIndex
+from pipeline import SequenceWindow
+from client_table import ClientTable, request_id, REPLAY, STALE
+from messages import Payload, PrePrepare, Prepare, Commit
+from metrics import REGISTRY, CONTENT_TYPE, PHASE_SECONDS, SIGN_SECONDS, VERIFY_SECONDS, DB_SECONDS
+from notifications import CommitNotifier, sse_event
 app = Flask(__name__)
 
 
-global_sequence_number = 0
 inventory_ledger = []
 
 
+def crt_pow(m, p, q, dp, dq, qinv):
+    """m^d mod pq via the Chinese Remainder Theorem (dp = d mod p-1, dq = d mod q-1)"""
+    m1 = pow(m, dp, p)
+    m2 = pow(m, dq, q)
+    return m2 + ((qinv * (m1 - m2)) % p) * q
+
+
 # --- RSANode Class Definition ---
 class RSANode:
     def __init__(self, name, p, q, e):
@@ -21,6 +37,10 @@ class RSANode:
         self.n = p * q
         self.phi = (p - 1) * (q - 1)
         self.d = pow(e, -1, self.phi)
+        # CRT parameters, computed once, so signing works mod p and q separately
+        self.dp = self.d % (p - 1)
+        self.dq = self.d % (q - 1)
+        self.qinv = pow(q, -1, p)
         self.view_number = 0
         self.sequence_number = 0
         self.prepare_messages = {}
@@ -28,19 +48,26 @@ class RSANode:
         self.message_log = []
 
     def sign(self, message):
+        start = time.perf_counter()
         message_bytes = message.encode()
         h = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
         if h >= self.n:
             h = h % self.n
-        return pow(h, self.d, self.n)
+        signature = crt_pow(h, self.p, self.q, self.dp, self.dq, self.qinv)
+        if RSA_CRT_CHECK and signature != pow(h, self.d, self.n):
+            raise ValueError(f"CRT signature mismatch for node {self.name}")
+        SIGN_SECONDS.observe(time.perf_counter() - start, node=self.name)
+        return signature
 
     def verify(self, message, signature, signer_name):
+        start = time.perf_counter()
         signer = nodes[signer_name]
         signer_e, signer_n = signer.e, signer.n
         message_bytes = message.encode()
         h_original = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
         sig_int = int(signature) if isinstance(signature, str) else signature
         h_recovered = pow(sig_int, signer_e, signer_n)
+        VERIFY_SECONDS.observe(time.perf_counter() - start, node=self.name)
         return h_original == h_recovered
 
 
@@ -70,7 +97,7 @@ def get_system_status():
         "total_nodes": len(nodes),
         "consensus_threshold": REQUIRED_APPROVALS,
         "records_stored": len(inventory_ledger),
-        "global_sequence_number": global_sequence_number, 
+        "global_sequence_number": sequence_window.next_seq,
         "nodes": [
             {"name": name, "view": node.view_number, "seq": node.sequence_number}
             for name, node in nodes.items()
@@ -85,23 +112,62 @@ def is_primary_node(node_name, view_number):
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_DIR = os.path.join(BASE_DIR, "database")
 
-def load_inventory_data():
-    inventory = {}
-    for node in ['A', 'B', 'C', 'D']:
-        file_path = os.path.join(DB_DIR, f"node_{node.lower()}.json")
-        if not os.path.exists(file_path):
-            print(f"Warning: {file_path} not found, setting inventory to empty.")
-            inventory[node] = []
-            continue
-        try:
-            with open(file_path) as f:
-                inventory[node] = json.load(f)["records"]
-        except json.JSONDecodeError:
-            print(f"Warning: {file_path} contains invalid JSON, skipping.")
-            inventory[node] = []
-    return inventory
+# One ledger per node in the configured storage backend and durability mode,
+# seeded from node_x.json on first run
+ledgers = {name: open_ledger(name, DB_DIR, STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE)
+           for name in nodes}
 
-INVENTORY = load_inventory_data()
+def load_inventory_data():
+    return {node: list(ledgers[node].records()) for node in ledgers}
+
+def build_index(node, records=None):
+    # SQLite answers item lookups from its own indexes
+    if isinstance(ledgers[node], SQLiteLedger):
+        return SQLItemIndex(ledgers[node])
+    return ItemIndex(ledgers[node].records() if records is None else records)
+
+# Per-node item_id index, rebuilt from the ledgers on startup and kept
+# current by append_db so queries never go back to disk
+INVENTORY = {node: build_index(node) for node in ledgers}
+
+# The sequencer: hands out sequence numbers to concurrent submits and applies
+# their commits in sequence order. Numbering resumes after the ledgers' highest
+sequence_window = SequenceWindow(PIPELINE_WINDOW, start=max(
+    (r.get("sequence") or 0 for index in INVENTORY.values() for r in index.records), default=0))
+
+# Outcome of every sequence number finished since startup, for /commits/*
+commit_notifier = CommitNotifier(floor=sequence_window.low, history=COMMIT_NOTIFY_HISTORY)
+
+# /metrics: request counts and latency per endpoint, plus values read at scrape time
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency per endpoint", ("endpoint",))
+REGISTRY.gauge("pbft_message_log_size", "Messages held in each node's log", ("node",),
+               collect=lambda: {(name,): len(node.message_log) for name, node in nodes.items()})
+REGISTRY.counter("db_bytes_total", "Bytes read from and written to each node's ledger", ("node", "operation"),
+                 collect=lambda: {key: value for name, ledger in ledgers.items()
+                                  for key, value in (((name, "read"), ledger.bytes_read),
+                                                     ((name, "write"), ledger.bytes_written))})
+COMMIT_PATHS = REGISTRY.counter(
+    "pbft_commits_total", "Committed instances by commit path (fast: no commit round)", ("path",))
+REGISTRY.counter("db_syncs_total", "fsyncs issued to make each node's commits durable", ("node",),
+                 collect=lambda: {(name,): ledger.durability.syncs for name, ledger in ledgers.items()})
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/')
 def index():
@@ -111,9 +177,6 @@ def index():
 # inventory query
 @app.route('/api/query', methods=['POST'])
 def handle_query():
-    global INVENTORY
-    INVENTORY = load_inventory_data()
-    
     data = request.json
     node_id = data.get('node')
     item_id = data.get('item_id')
@@ -121,27 +184,50 @@ def handle_query():
     if node_id not in INVENTORY:
         return jsonify({"error": "Invalid node ID"}), 400
 
-    results = []
-    for record in INVENTORY[node_id]:
-        try:
-            if "record" not in record or not isinstance(record["record"], str):
+    # Optional paging: cursor is the last ledger position already seen
+    cursor = data.get('cursor')
+    limit = data.get('limit')
+    stream = data.get('stream') or "application/x-ndjson" in request.headers.get("Accept", "")
+    if (cursor is not None and (not isinstance(cursor, int) or cursor < -1)) or \
+            (limit is not None and (not isinstance(limit, int) or not 1 <= limit <= QUERY_MAX_PAGE_SIZE)):
+        return jsonify({"error": f"cursor must be an integer >= -1 and limit 1-{QUERY_MAX_PAGE_SIZE}"}), 400
+    after = -1 if cursor is None else cursor
+
+    if stream:
+        # One JSON result per line, produced as the index is walked
+        def generate():
+            for position, record in INVENTORY[node_id].scan(item_id, after):
+                result = format_result(record, item_id)
+                if result is not None:
+                    result["cursor"] = position
+                    yield json.dumps(result) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if cursor is not None or limit is not None:
+        limit = limit or QUERY_PAGE_SIZE
+        results = []
+        last_position = next_cursor = None
+        for position, record in INVENTORY[node_id].scan(item_id, after):
+            result = format_result(record, item_id)
+            if result is None:
                 continue
-            parts = record["record"].split(":")
-            if not item_id or (len(parts) >= 2 and parts[1] == item_id):
-                result = {
-                    "node_id": parts[0],
-                    "item_id": parts[1],
-                    "quantity": int(parts[2]) if len(parts) > 2 else None,
-                    "price": int(parts[3]) if len(parts) > 3 else None,
-                    "signature": record.get("signature"),
-                    "status": record.get("status") or f"Verified by {record.get('verified_by')}",
-                    "is_primary": record.get("is_primary", False)
-
-                }
-                results.append(result)
-        except (KeyError, AttributeError):
-            continue
-
+            if len(results) == limit:
+                next_cursor = last_position  # There is at least one more result
+                break
+            results.append(result)
+            last_position = position
+        return jsonify({
+            "success": True,
+            "node_queried": node_id,
+            "item_id": item_id,
+            "count": len(results),
+            "results": results,
+            "next_cursor": next_cursor
+        })
+
+    results = [result for result in (format_result(record, item_id)
+                                     for record in INVENTORY[node_id].lookup(item_id))
+               if result is not None]
     unique_results = {tuple(record.items()) for record in results}
     results = [(record) for record in unique_results]
 
@@ -155,34 +241,87 @@ def handle_query():
     })
 
 
+def format_result(record, item_id):
+    """The /api/query view of a committed record, or None if it doesn't match"""
+    try:
+        if "record" not in record or not isinstance(record["record"], str):
+            return None
+        parts = record["record"].split(":")
+        if item_id and (len(parts) < 2 or parts[1] != item_id):
+            return None
+        return {
+            "node_id": parts[0],
+            "item_id": parts[1],
+            "quantity": int(parts[2]) if len(parts) > 2 else None,
+            "price": int(parts[3]) if len(parts) > 3 else None,
+            "signature": record.get("signature"),
+            "status": record.get("status") or f"Verified by {record.get('verified_by')}",
+            "is_primary": record.get("is_primary", False)
+        }
+    except (KeyError, AttributeError, IndexError, ValueError):
+        return None
+
+
 def get_primary_node(view_number):
     if not nodes:  # Handle empty node list
         return None
     return list(nodes.keys())[view_number % len(nodes)]
 
 def get_db(node):
-    os.makedirs("Task1/Part2/database", exist_ok=True)
-    path = os.path.join("Task1", "Part2", "database", f"node_{node.lower()}.json")
-    if not os.path.exists(path):
-        return {"records": []}
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except:
-        return {"records": []}
+    start = time.perf_counter()
+    data = ledgers[node].export()
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="read")
+    return data
 
 def save_db(node, data):
-    os.makedirs("Task1/Part2/database", exist_ok=True)
-    path = os.path.join("Task1", "Part2", "database", f"node_{node.lower()}.json")
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=1)
+    start = time.perf_counter()
+    ledgers[node].replace(data["records"])
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="replace")
+    INVENTORY[node] = build_index(node, data["records"])
+
+def append_db(node, record):
+    # Committing a record is a single append, independent of ledger size;
+    # returns the ticket to acknowledge it with
+    start = time.perf_counter()
+    ticket = ledgers[node].append(record)
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="append")
+    INVENTORY[node].add(record)
+    return ticket
+
+def wait_durable(tickets):
+    """Acknowledge commits: True once each node's records up to its ticket
+    ({node: ticket}) are on disk; always False in relaxed mode"""
+    durable = True
+    for node, ticket in tickets.items():
+        start = time.perf_counter()
+        durable = ledgers[node].wait_durable(ticket) and durable
+        DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="sync")
+    return durable
         
 
 
+# Last request and reply per client, so retransmitted submits are answered
+# without another consensus round
+client_table = ClientTable()
+REPLAYED_REPLIES = REGISTRY.counter(
+    "pbft_replayed_replies_total", "Submits answered from the client table instead of running consensus")
+
+def answer_retransmission(client_id, timestamp):
+    """The response to a retransmitted or stale submit, or None for a new one"""
+    state, reply = client_table.check(client_id, timestamp, CLIENT_REPLY_WAIT)
+    if state == STALE:
+        return jsonify({"error": "Stale request: this client has already sent a newer one"}), 409
+    if state == REPLAY:
+        if reply is None:
+            return jsonify({"error": "The original request failed or is still being ordered, retry"}), 503
+        REPLAYED_REPLIES.inc()
+        return jsonify(reply)
+    return None
+
+
 # Route for submitting a record
 @app.route('/submit', methods=['POST'])
 def submit():
-    global global_sequence_number
     data = request.json
     node = data.get("node")
     record = data.get("record")
@@ -190,36 +329,70 @@ def submit():
 
     if not node or not record or node not in nodes:
         return jsonify({"error": "Invalid input"}), 400
+    try:
+        client_id, timestamp = request_id(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if client_id is not None:
+        response = answer_retransmission(client_id, timestamp)
+        if response is not None:
+            return response
 
     # Check if this node is the primary for the current view
     current_view = nodes[node].view_number
     is_primary = (node == get_primary_node(current_view))
 
-   
-     # Use global sequence number and increment it
-    global_sequence_number += 1
-    sequence_number = global_sequence_number
-    
+    # Take the next sequence number, waiting if the window is full
+    sequence_number = sequence_window.acquire()
+
     # Update the node's sequence number to match (for consistency)
     nodes[node].sequence_number = sequence_number
 
+    committed_records = []
+    tickets = {}  # {node: ticket of its last append}
+
+    def apply():
+        # Runs under the window lock once every lower sequence number has been
+        # applied, so the ledgers only ever see commits in sequence order
+        phase_start = time.perf_counter()
+        for committed_record in committed_records:
+            for name in nodes:
+                tickets[name] = append_db(name, committed_record)
+                inventory_ledger.append(committed_record)
+        if committed_records:
+            PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="persist")
+
+    reply = None
+    try:
+        reply = _run_phases(node, record, sequence_number, current_view, is_primary, committed_records)
+    finally:
+        sequence_window.complete(sequence_number, apply)
+        # Waited for outside the window lock, so later sequences keep
+        # appending into the same group meanwhile
+        durable = wait_durable(tickets) if tickets else False
+        commit_notifier.publish(sequence_number, "committed" if tickets else "failed")
+        if reply is not None:
+            reply["durable"] = durable
+        if client_id is not None:
+            client_table.finish(client_id, timestamp, reply)
+    return jsonify(reply)
+
+
+def _run_phases(node, record, sequence_number, current_view, is_primary, committed_records):
     # --- Phase 1: Pre-Prepare ---
-    
+    phase_start = time.perf_counter()
+    # Every message of this instance shares one Payload (record text + digest)
+    payload = Payload(record)
+    record = payload.text
     signature = nodes[node].sign(record)
 
     # Store pre-prepare message
-    pre_prepare = {
-        'sequence': sequence_number,
-        'view': current_view,
-        'phase': 'pre-prepare',
-        'record': record,
-        'signature': signature,
-        'sender': node,
-        'is_primary': is_primary
-    }
+    pre_prepare = PrePrepare(sequence_number, current_view, payload, signature, node, is_primary)
     nodes[node].message_log.append(pre_prepare)
+    PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="pre-prepare")
 
     # --- Phase 2: Prepare ---
+    phase_start = time.perf_counter()
     prepare_messages = []
     for name in nodes:
         if name == node:
@@ -229,68 +402,53 @@ def submit():
         if not nodes[name].verify(record, signature, node):
             continue
 
-        prepare = {
-            'sequence': sequence_number,
-            'view': current_view,
-            'phase': 'prepare',
-            'record': record,
-            'signature': nodes[name].sign(f"{sequence_number}:{current_view}:{record}"),
-            'sender': name
-        }
+        prepare = Prepare(sequence_number, current_view, payload,
+                          nodes[name].sign(f"{sequence_number}:{current_view}:{record}"), name)
         nodes[name].prepare_messages[(sequence_number, current_view)] = prepare
         nodes[name].message_log.append(prepare)
         prepare_messages.append(prepare)
 
+    PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="prepare")
+
+    # Fast path: the pre-prepare plus a prepare from every backup means all
+    # 3f+1 replicas agree, so the instance commits without a commit round
+    fast = FAST_PATH and len(prepare_messages) == len(nodes) - 1
+
     # --- Phase 3: Commit ---
+    phase_start = time.perf_counter()
     commit_messages = []
-    consensus_reached = False
     print(len(prepare_messages))
-    if len(prepare_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
+    if not fast and len(prepare_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
         for name in nodes:
-            commit = {
-                'sequence': sequence_number,
-                'view': current_view,
-                'phase': 'commit',
-                'record': record,
-                'signature': nodes[name].sign(f"commit:{sequence_number}:{current_view}:{record}"),
-                'sender': name
-            }
+            commit = Commit(sequence_number, current_view, payload,
+                            nodes[name].sign(f"commit:{sequence_number}:{current_view}:{record}"), name)
             nodes[name].commit_messages[(sequence_number, current_view)] = commit
             nodes[name].message_log.append(commit)
             commit_messages.append(commit)
+        PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="commit")
 
     # --- Check if consensus threshold met ---
     print(f"Commit messages count: {len(commit_messages)}")
-    if len(commit_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
+    commit_path = "fast" if fast else "normal"
+    if fast or len(commit_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
         status = "committed"
-        # Apply to all nodes' databases
-        for name in nodes:
-            db = get_db(name)
-            db["records"].append({
-                "record": record,
-                "signature": str(signature),
-                "status": "committed",
-                "verified_by": "PBFT",
-                "sequence": sequence_number,
-                "view": current_view,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "is_primary": is_primary
-            })
-            save_db(name, db)
-            inventory_ledger.append({
-                "record": record,
-                "signature": str(signature),
-                "status": "committed",
-                "verified_by": "PBFT",
-                "sequence": sequence_number,
-                "view": current_view,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "is_primary": is_primary
-            })
+        COMMIT_PATHS.inc(path=commit_path)
+        # Applied to all nodes' databases once its turn comes
+        committed_records.append({
+            "record": record,
+            "signature": str(signature),
+            "status": "committed",
+            "verified_by": "PBFT",
+            "sequence": sequence_number,
+            "view": current_view,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "is_primary": is_primary,
+            "commit_path": commit_path
+        })
     else:
         status = "pending"
 
-    return jsonify({
+    return {
         "status": f"Consensus {status}",
         "record_status": status,
         "record": record,
@@ -299,10 +457,9 @@ def submit():
         "view": current_view,
         "prepares_count": len(prepare_messages),
         "commits_count": len(commit_messages),
-        "prepares": prepare_messages,
-        "commits": commit_messages,
+        "commit_path": commit_path,
         "is_primary": is_primary,
-        "consensus_reached": len(commit_messages) + 1 >= REQUIRED_APPROVALS,
+        "consensus_reached": status == "committed",
         "pre_prepare": {
             "sender": node,
             "record": record,
@@ -310,18 +467,61 @@ def submit():
         },
         "prepares": [
             {
-                "sender": msg["sender"],
-                "signature": msg["signature"]
+                "sender": msg.sender,
+                "signature": msg.signature
             } for msg in prepare_messages
         ],
         "commits": [
             {
-                "sender": msg["sender"],
-                "signature": msg["signature"]
+                "sender": msg.sender,
+                "signature": msg.signature
             } for msg in commit_messages
-        ],
-        "consensus_reached": consensus_reached
-    })
+        ]
+    }
+
+
+# Push notifications: clients wait for their sequence number to finish
+# instead of polling /status
+@app.route('/commits/wait')
+def commit_wait():
+    """Long-poll: answers as soon as the sequence commits or fails, or with
+    state "pending" once the timeout runs out"""
+    sequence = request.args.get("sequence", type=int)
+    if sequence is None:
+        return jsonify({"error": "sequence is required"}), 400
+    timeout = request.args.get("timeout", COMMIT_WAIT_TIMEOUT, type=float)
+    timeout = min(max(timeout, 0), COMMIT_WAIT_TIMEOUT)
+    return jsonify({"sequence": sequence, "state": commit_notifier.wait(sequence, timeout)})
+
+@app.route('/commits/stream')
+def commit_stream():
+    """Server-sent events, one "commit" event per finished sequence number.
+    With ?sequence=N the stream ends after N's event. Reconnecting clients
+    resume from Last-Event-ID."""
+    sequence = request.args.get("sequence", type=int)
+    resume_from = request.headers.get("Last-Event-ID", type=int)
+
+    def generate():
+        # Take the position before checking, so an outcome published in
+        # between still arrives as an event
+        last_id = commit_notifier.last_id if resume_from is None else resume_from
+        if sequence is not None and resume_from is None:
+            state = commit_notifier.outcome(sequence)
+            if state is not None:
+                yield sse_event(last_id, "commit", json.dumps({"sequence": sequence, "state": state}))
+                return
+        while True:
+            events = commit_notifier.events_after(last_id, COMMIT_STREAM_KEEPALIVE)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for last_id, finished, state in events:
+                yield sse_event(last_id, "commit", json.dumps({"sequence": finished, "state": state}))
+                if finished == sequence:
+                    return
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
       
 if __name__ == '__main__':
@@ -1,3 +1,6 @@
+import os
+
+
 class NodeConfig:
     def __init__(self, p, q, e):
         self.p = p
@@ -34,3 +37,44 @@ CONSENSUS_PROTOCOL = "PBFT"
 MAX_FAULTY_NODES = 1  # f=1 for 4 nodes # Ref: https://www.geeksforgeeks.org/minimum-number-of-nodes-to-achieve-byzantine-fault-tolerance/
 REQUIRED_APPROVALS = 2 * MAX_FAULTY_NODES + 1  # 3 (including primary) for f=1
 CONSENSUS_THRESHOLD = .75  # Honest Nodes ≥ (Total Nodes / 3) * 2 --> (4/3) * 2 --> (8/3) --> 2.667 out of 4 --> Honest Nodes ≥ 2.66 out of 4 --> 3 out of 4 (round up) --> 0.75
+
+# Recompute every CRT signature/decryption the plain pow(m, d, n) way and
+# raise on mismatch. Slow; only for validating the CRT path.
+RSA_CRT_CHECK = False
+
+# At most PIPELINE_WINDOW submits may be between taking a sequence number and
+# applying it; commits reach the ledgers strictly in sequence order
+PIPELINE_WINDOW = 8
+
+# /api/query pagination: default and largest page size
+QUERY_PAGE_SIZE = 100
+QUERY_MAX_PAGE_SIZE = 1000
+
+# Longest a /commits/wait long-poll blocks, and the gap between keep-alive
+# comments on an idle /commits/stream, in seconds
+COMMIT_WAIT_TIMEOUT = 30
+COMMIT_STREAM_KEEPALIVE = 15
+# Finished sequence numbers whose outcome the notifier remembers
+COMMIT_NOTIFY_HISTORY = 4096
+
+# How long a retransmitted submit waits for the original's reply, in seconds
+CLIENT_REPLY_WAIT = 30
+
+# Where node ledgers are stored: "segment" (append-only node_x.ledger files)
+# or "sqlite" (one WAL-mode SQLite database, queried through its indexes)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "segment")
+
+# When a commit counts as durable: "strict" fsyncs every commit, "group"
+# fsyncs straight away when no fsync is running and otherwise lets the
+# commits that arrive meanwhile share the next one, "relaxed" leaves them in
+# the OS page cache. Group mode also syncs records nobody waits on after
+# GROUP_COMMIT_INTERVAL seconds or GROUP_COMMIT_SIZE records. Submits are
+# only acknowledged as durable once their fsync has finished.
+DURABILITY = os.environ.get("DURABILITY", "group")
+GROUP_COMMIT_INTERVAL = 0.005
+GROUP_COMMIT_SIZE = 64
+
+# Speculative fast path: an instance whose pre-prepare gets a matching prepare
+# from every other replica (all 3f+1 agree) commits without the commit round.
+# Any missing or rejected prepare falls back to the normal commit phase.
+FAST_PATH = os.environ.get("FAST_PATH", "off") == "on"
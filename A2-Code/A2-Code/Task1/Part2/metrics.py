@@ -0,0 +1,159 @@
+"""Counters, gauges and histograms rendered in the Prometheus text format.
+
+    PHASE_SECONDS = REGISTRY.histogram("pbft_phase_seconds", "...", ("phase",))
+    PHASE_SECONDS.observe(elapsed, phase="prepare")
+
+A metric built with collect=fn reads its values from fn() at scrape time
+instead (fn returns {label values tuple: value}), for things the app already
+tracks such as message log sizes. snapshot() gives the samples as plain data
+so a gateway can merge in metrics from the replica processes.
+"""
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; PBFT phases and RSA operations mostly land between 0.1 ms and 1 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.values = {}  # {label values tuple: value}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """[(name suffix, {label: value}, value), ...]"""
+        if self.collect is not None:
+            values = self.collect()
+        else:
+            with self.lock:
+                values = dict(self.values)
+        return [("", dict(zip(self.labels, key)), value) for key, value in sorted(values.items())]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]  # per-bucket counts, sum, count
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=(), collect=None):
+        return self._register(Counter(name, help, labels, collect))
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self._register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def snapshot(self):
+        """Every metric family as JSON-friendly data"""
+        return [{"name": m.name, "help": m.help, "type": m.type, "samples": m.samples()} for m in self.metrics]
+
+    def render(self, extra=None):
+        """Prometheus text exposition. extra is {label value: snapshot} from
+        other processes; their samples get a replica="<label value>" label."""
+        families = {family["name"]: dict(family, samples=list(family["samples"])) for family in self.snapshot()}
+        for replica, snapshot in (extra or {}).items():
+            for family in snapshot:
+                merged = families.setdefault(family["name"], dict(family, samples=[]))
+                merged["samples"].extend((suffix, {"replica": replica, **labels}, value)
+                                         for suffix, labels, value in family["samples"])
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for suffix, labels, value in family["samples"]:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared by the app and, in multi-process mode, the replica processes
+PHASE_SECONDS = REGISTRY.histogram(
+    "pbft_phase_duration_seconds", "Time spent in each PBFT phase per instance", ("phase",))
+SIGN_SECONDS = REGISTRY.histogram(
+    "rsa_sign_duration_seconds", "RSA signing time per signing node", ("node",))
+VERIFY_SECONDS = REGISTRY.histogram(
+    "rsa_verify_duration_seconds", "RSA verification time per verifying node", ("node",))
+DB_SECONDS = REGISTRY.histogram(
+    "db_operation_duration_seconds", "Ledger read/write time per node", ("node", "operation"))
@@ -0,0 +1,56 @@
+"""Push notifications for finished PBFT instances.
+
+Whoever applies an instance publishes its outcome ("committed", or "failed"
+when it missed the quorum). HTTP handlers block on the notifier instead of
+having clients poll: /commits/wait answers one long-poll as soon as a
+sequence number finishes, and /commits/stream sends every outcome as a
+server-sent event.
+"""
+import threading
+from collections import OrderedDict, deque
+
+
+def sse_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class CommitNotifier:
+    def __init__(self, floor=0, history=4096):
+        # Sequences at or below floor finished before we started (or were
+        # forgotten); their outcome is reported as "unknown"
+        self.floor = floor
+        self.history = history
+        self.outcomes = OrderedDict()  # {sequence: state}, oldest first
+        self.events = deque(maxlen=history)  # (event id, sequence, state)
+        self.last_id = 0
+        self.cond = threading.Condition()
+
+    def publish(self, sequence, state):
+        with self.cond:
+            self.outcomes[sequence] = state
+            while len(self.outcomes) > self.history:
+                forgotten, _ = self.outcomes.popitem(last=False)
+                self.floor = max(self.floor, forgotten)
+            self.last_id += 1
+            self.events.append((self.last_id, sequence, state))
+            self.cond.notify_all()
+
+    def outcome(self, sequence):
+        """The sequence's state, or None while it is still in progress"""
+        with self.cond:
+            state = self.outcomes.get(sequence)
+            if state is None and sequence <= self.floor:
+                return "unknown"
+            return state
+
+    def wait(self, sequence, timeout):
+        """Block until the sequence finishes; "pending" if timeout runs out first"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.outcome(sequence) is not None, timeout)
+            return self.outcome(sequence) or "pending"
+
+    def events_after(self, event_id, timeout):
+        """Events newer than event_id, waiting up to timeout for the first one"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.last_id > event_id, timeout)
+            return [event for event in self.events if event[0] > event_id]
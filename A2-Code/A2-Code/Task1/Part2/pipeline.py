@@ -0,0 +1,81 @@
+"""Pipelined consensus: sequence numbers bounded by low/high watermarks.
+
+Several PBFT instances may be in flight at once, as long as their sequence
+numbers fall inside (low, low + window]. Instances can commit in any order,
+but their records are applied to the ledger strictly in sequence order and
+the low watermark only advances past sequences that have been applied.
+"""
+import threading
+
+
+class SequenceWindow:
+    def __init__(self, window, start=0):
+        self.window = window
+        self.low = start  # Low watermark: highest sequence applied so far
+        self.next_seq = start  # Highest sequence handed out so far
+        self.ready = {}  # {sequence: apply callable or None}
+        self.cond = threading.Condition()
+
+    @property
+    def high(self):
+        return self.low + self.window
+
+    def in_flight(self):
+        with self.cond:
+            return self.next_seq - self.low
+
+    def acquire(self):
+        """Assign the next sequence number, waiting while the window is full"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.next_seq < self.high)
+            self.next_seq += 1
+            return self.next_seq
+
+    def accept(self, sequence):
+        """Check a sequence number assigned by the primary against the window"""
+        with self.cond:
+            if not self.low < sequence <= self.high:
+                return False
+            self.next_seq = max(self.next_seq, sequence)
+            return True
+
+    def complete(self, sequence, apply=None):
+        """Mark an instance finished and block until it has been applied.
+
+        apply is called under the window lock once every lower sequence has
+        been applied; pass None for an instance that did not commit so it
+        still releases its slot.
+        """
+        with self.cond:
+            if sequence <= self.low:
+                return  # Already covered by a state transfer
+            self.ready[sequence] = apply
+            self._drain()
+            self.cond.wait_for(lambda: self.low >= sequence)
+
+    def advance(self, base, sequence, apply):
+        """Jump the low watermark from base to sequence after a state transfer.
+
+        apply installs the transferred records under the window lock. Returns
+        False without calling it if the window has moved past base meanwhile.
+        """
+        with self.cond:
+            if self.low != base or sequence <= base:
+                return False
+            apply()
+            self.low = sequence
+            self.next_seq = max(self.next_seq, sequence)
+            for stale in [s for s in self.ready if s <= sequence]:
+                del self.ready[stale]
+            self._drain()
+            return True
+
+    def _drain(self):
+        while self.low + 1 in self.ready:
+            apply_next = self.ready.pop(self.low + 1)
+            try:
+                if apply_next is not None:
+                    apply_next()
+            finally:
+                self.low += 1
+        self.cond.notify_all()
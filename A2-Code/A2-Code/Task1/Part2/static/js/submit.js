@@ -1,5 +1,34 @@
 // In submit.js
 
+// PBFT client identity. A retry reuses its request's timestamp, so the server
+// answers it from its reply cache instead of ordering the record again
+const clientId = sessionStorage.getItem("clientId") || crypto.randomUUID();
+sessionStorage.setItem("clientId", clientId);
+let lastTimestamp = 0;
+
+async function postSubmit(body, attempts = 3) {
+    lastTimestamp = Math.max(Date.now(), lastTimestamp + 1);
+    const request = JSON.stringify({ ...body, client_id: clientId, timestamp: lastTimestamp });
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const res = await fetch('/submit', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: request
+            });
+            if (res.status !== 503 || attempt === attempts) {
+                return res;
+            }
+        } catch (err) {
+            // Network failure: the server may or may not have seen the request
+            if (attempt === attempts) {
+                throw err;
+            }
+        }
+        await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+    }
+}
+
 document.getElementById("recordForm").addEventListener("submit", async (e) => {
     e.preventDefault();
     const resultDiv = document.getElementById("result");
@@ -17,11 +46,7 @@ document.getElementById("recordForm").addEventListener("submit", async (e) => {
 
     try {
         // Step 1: Submit record to primary node
-        const submitRes = await fetch('/submit', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ node, record })
-        });
+        const submitRes = await postSubmit({ node, record });
         
         const submitResult = await submitRes.json();
         console.log("Full submit result:", submitResult);
@@ -53,7 +78,7 @@ document.getElementById("recordForm").addEventListener("submit", async (e) => {
 
     <h3> 😲 Final Consensus</h3>
     <p><strong>Consensus Reached:</strong> ${submitResult.prepares_count} prepares, 
-                ${submitResult.commits_count} commits</p>
+                ${submitResult.commits_count} commits${submitResult.commit_path === "fast" ? " (fast path)" : ""}</p>
     <p><strong>Primary Node:</strong> ${submitResult.is_primary ? "Yes" : "No"}</p>
 
         `;
@@ -61,18 +86,30 @@ document.getElementById("recordForm").addEventListener("submit", async (e) => {
         if (submitResult.record_status === "committed") {
             output += `<p class="success"> Record committed to blockchain</p>`;
         } else {
-            // Poll for status updates
-            const pollStatus = async () => {
-                const statusRes = await fetch(`/status?sequence=${submitResult.sequence}&view=${submitResult.view}`);
-                const status = await statusRes.json();
-                if (status.state === "committed") {
-                    output += `<p class="success"> Record committed to blockchain</p>`;
-                    resultDiv.innerHTML = output;
-                } else {
-                    setTimeout(pollStatus, 1000);
+            // The server pushes the outcome once this sequence number finishes
+            const sequence = submitResult.sequence;
+            const showOutcome = (state) => {
+                if (state === "committed") {
+                    output += `<p class="success">Record committed to blockchain</p>`;
+                } else if (state !== "pending") {
+                    output += `<p class="error">Sequence ${sequence} finished without committing (${state})</p>`;
+                }
+                resultDiv.innerHTML = output;
+            };
+            const events = new EventSource(`/commits/stream?sequence=${sequence}`);
+            events.addEventListener("commit", (event) => {
+                const outcome = JSON.parse(event.data);
+                if (outcome.sequence === sequence) {
+                    events.close();
+                    showOutcome(outcome.state);
                 }
+            });
+            events.onerror = async () => {
+                // Stream unavailable (e.g. a buffering proxy): fall back to one long-poll
+                events.close();
+                const waitRes = await fetch(`/commits/wait?sequence=${sequence}`);
+                showOutcome((await waitRes.json()).state);
             };
-            pollStatus();
         }
 
         resultDiv.innerHTML = output;
@@ -1,61 +1,45 @@
-from flask import Flask, request, jsonify, render_template
-import hashlib
+from flask import Flask, request, jsonify, render_template, g, Response, stream_with_context
 import json
 import os
 import datetime
-from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES, PKG, PROCUREMENT_OFFICER
+import time
+from collections import defaultdict
+from config import NODES, CONSENSUS_THRESHOLD, REQUIRED_APPROVALS, TOTAL_NODES, PKG, PROCUREMENT_OFFICER, BATCH_MAX_SIZE, BATCH_MAX_WAIT, PIPELINE_WINDOW, RSA_CRT_CHECK, HARN_WINDOW_BITS
+from config import CHECKPOINT_INTERVAL, QUERY_PAGE_SIZE, QUERY_MAX_PAGE_SIZE, PBFT_MODE, REPLICA_HOST, REPLICA_PORTS, REPLICA_TIMEOUT
+from config import COMMIT_WAIT_TIMEOUT, COMMIT_STREAM_KEEPALIVE, COMMIT_NOTIFY_HISTORY, ENVELOPE_CHUNK_SIZE, CLIENT_REPLY_WAIT
+from config import STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE, FAST_PATH
+from rsa_node import RSANode, crt_pow
+from storage import open_ledger, SQLiteLedger, SQLItemIndex
+from item_index import ItemIndex
+from batching import RequestBatcher, batch_message
+from pipeline import SequenceWindow
+from harn_keys import HarnKeyStore
+from transport import ReplicaClient
+from checkpoint import CheckpointTracker, checkpoint_message
+from state_transfer import records_between, batches, batch_committed, certificate_message
+from merkle import MerkleTree, root_message, verify_proof
+from messages import Payload, PrePrepare, Prepare, Commit
+from metrics import REGISTRY, CONTENT_TYPE, PHASE_SECONDS, DB_SECONDS
+from notifications import CommitNotifier, sse_event
+from envelope import seal, open_chunks, is_envelope
+from client_table import ClientTable, request_id, REPLAY, STALE
 
-global_sequence_number = 0
 app = Flask(__name__)
 
 inventory_ledger = []
 
-
-# --- RSANode Class Definition ---
-class RSANode:
-    def __init__(self, name, p, q, e):
-        self.name = name
-        self.p = p
-        self.q = q
-        self.e = e
-        self.n = p * q
-        self.phi = (p - 1) * (q - 1)
-        self.d = pow(e, -1, self.phi)
-        self.view_number = 0
-        self.sequence_number = 0
-        self.prepare_messages = {}
-        self.commit_messages = {}
-        self.message_log = []
-
-    def sign(self, message):
-        message_bytes = message.encode()
-        h = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
-        if h >= self.n:
-            h = h % self.n
-        return pow(h, self.d, self.n)
-
-    def verify(self, message, signature, signer_name):
-        signer = nodes[signer_name]
-        signer_e, signer_n = signer.e, signer.n
-        message_bytes = message.encode()
-        h_original = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
-        sig_int = int(signature) if isinstance(signature, str) else signature
-        h_recovered = pow(sig_int, signer_e, signer_n)
-        return h_original == h_recovered
+# g_i and r_i never change, so derive them (and r_i's window tables) once
+harn_keys = HarnKeyStore(PKG, NODES, window=HARN_WINDOW_BITS)
 
 class HarnMultiSignature:
     @staticmethod
     def generate_secret_key(identity):
-        return pow(identity, PKG.d, PKG.n)
+        return harn_keys.secret_key(identity)
 
 
     @staticmethod
     def sign_message(node_id, message):
-        node = NODES[node_id]
-        g_i = HarnMultiSignature.generate_secret_key(node.identity)
-        r_i = node.random_val
-        h = int(hashlib.sha256(message.encode()).hexdigest(), 16) % PKG.n
-        return (g_i * pow(r_i, h, PKG.n)) % PKG.n
+        return harn_keys.sign(node_id, message)
 
 
 def encrypt_message_harn(message, recipient_identity):
@@ -112,11 +96,19 @@ def get_system_status():
         "total_nodes": len(nodes),
         "consensus_threshold": REQUIRED_APPROVALS,
         "records_stored": len(inventory_ledger),
-        "global_sequence_number": global_sequence_number, 
+        "global_sequence_number": sequence_window.next_seq,
+        "low_watermark": sequence_window.low,
+        "high_watermark": sequence_window.high,
+        "in_flight": sequence_window.in_flight(),
+        "stable_checkpoint": {name: tracker.stable["sequence"] for name, tracker in checkpoints.items()},
+        "message_log_sizes": {name: len(node.message_log) for name, node in nodes.items()},
+        "last_committed": {name: ledger_tip(name) for name in ledgers},
         "nodes": [
             {"name": name, "view": node.view_number, "seq": node.sequence_number}
             for name, node in nodes.items()
-        ]
+        ],
+        "mode": PBFT_MODE,
+        "replicas": replica_status() if MULTIPROCESS else None
     }
 
 # Add this helper function at the top level
@@ -128,23 +120,152 @@ def is_primary_node(node_name, view_number):
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_DIR = os.path.join(BASE_DIR, "database")
 
+# In multi-process mode every replica process owns its ledger and this app
+# is only a client gateway, so it must not open the ledgers itself
+MULTIPROCESS = PBFT_MODE == "multiprocess"
+replica_client = ReplicaClient(REPLICA_HOST, REPLICA_PORTS, REPLICA_TIMEOUT) if MULTIPROCESS else None
+
+# One ledger per node in the configured storage backend and durability mode,
+# seeded from node_x.json on first run
+ledgers = {} if MULTIPROCESS else {
+    name: open_ledger(name, DB_DIR, STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE)
+    for name in nodes}
+
+def ledger_tip(node):
+    """Sequence of the node's newest record, from the ledger's in-memory tail"""
+    recent = ledgers[node].recent(1)
+    return recent[0].get("sequence") if recent else None
+
 def load_inventory_data():
-    inventory = {}
-    for node in ['A', 'B', 'C', 'D']:
-        file_path = os.path.join(DB_DIR, f"node_{node.lower()}.json")
-        if not os.path.exists(file_path):
-            print(f"Warning: {file_path} not found, setting inventory to empty.")
-            inventory[node] = []
+    return {node: list(ledgers[node].records()) for node in ledgers}
+
+def build_index(node, records=None):
+    # SQLite answers item lookups from its own indexes
+    if isinstance(ledgers[node], SQLiteLedger):
+        return SQLItemIndex(ledgers[node])
+    return ItemIndex(ledgers[node].records() if records is None else records)
+
+# Per-node item_id index, rebuilt from the ledgers on startup and kept
+# current by append_db so queries never go back to disk
+INVENTORY = {node: build_index(node) for node in ledgers}
+
+def catch_up_ledgers():
+    """Bring any node whose ledger is behind (e.g. restored from an old copy)
+    level with the node furthest ahead, copying only the missing batches and
+    checking each one's commit signatures before appending it"""
+    tips = {node: max((r.get("sequence") or 0 for r in INVENTORY[node].records), default=0)
+            for node in INVENTORY}
+    if not tips:
+        return
+    source = max(tips, key=tips.get)
+    for node, tip in tips.items():
+        if tip >= tips[source]:
             continue
+        missing, _ = records_between(INVENTORY[source].records, tip, tips[source], float("inf"))
+        for sequence, batch in batches(missing):
+            if not batch_committed(nodes[node], sequence, batch, REQUIRED_APPROVALS):
+                print(f"Node {node}: batch {sequence} from {source} is not committed by a quorum")
+                break
+            for record in batch:
+                ledgers[node].append(record)
+                INVENTORY[node].add(record)
+
+catch_up_ledgers()
+
+# Sequence numbers resume after the highest one already in the ledgers
+sequence_window = SequenceWindow(PIPELINE_WINDOW, start=max(
+    (r.get("sequence") or 0 for index in INVENTORY.values() for r in index.records), default=0))
+
+# Outcome of every sequence number finished since startup, for /commits/*
+commit_notifier = CommitNotifier(floor=sequence_window.low, history=COMMIT_NOTIFY_HISTORY)
+
+# Each node's state digest and stable checkpoint, rebuilt from its ledger
+checkpoints = {name: CheckpointTracker.from_records(INVENTORY[name].records, CHECKPOINT_INTERVAL, REQUIRED_APPROVALS)
+               for name in ledgers}
+
+# Each node's Merkle tree over its committed records and the root it last
+# signed; verify-query proves results against that root
+merkle_trees = {name: MerkleTree(INVENTORY[name].records) for name in ledgers}
+signed_roots = {}
+
+def sign_merkle_root(node, sequence):
+    tree = merkle_trees[node]
+    size = len(tree)
+    root = tree.root(size)
+    signature = HarnMultiSignature.sign_message(node, root_message(sequence, size, root))
+    signed_roots[node] = {"sequence": sequence, "size": size, "root": root, "signature": str(signature)}
+
+for name in merkle_trees:
+    sign_merkle_root(name, checkpoints[name].sequence)
+
+# /metrics: request counts and latency per endpoint, plus values read at scrape time
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency per endpoint", ("endpoint",))
+REGISTRY.gauge("pbft_message_log_size", "Messages held in each node's log", ("node",),
+               collect=lambda: {(name,): len(node.message_log) for name, node in nodes.items()})
+REGISTRY.gauge("pbft_in_flight_instances", "PBFT instances between pre-prepare and apply",
+               collect=lambda: {(): sequence_window.in_flight()})
+REGISTRY.counter("db_bytes_total", "Bytes read from and written to each node's ledger", ("node", "operation"),
+                 collect=lambda: {key: value for name, ledger in ledgers.items()
+                                  for key, value in (((name, "read"), ledger.bytes_read),
+                                                     ((name, "write"), ledger.bytes_written))})
+COMMIT_PATHS = REGISTRY.counter(
+    "pbft_commits_total", "Committed instances by commit path (fast: no commit round)", ("path",))
+REGISTRY.counter("db_syncs_total", "fsyncs issued to make each node's commits durable", ("node",),
+                 collect=lambda: {(name,): ledger.durability.syncs for name, ledger in ledgers.items()})
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+def lookup_records(node, item_id=None):
+    """Committed records on a node, optionally only those for item_id"""
+    if MULTIPROCESS:
+        return replica_client.call(node, {"phase": "query", "item_id": item_id})["records"]
+    return INVENTORY[node].lookup(item_id)
+
+def scan_records(node, item_id=None, after=-1):
+    """(ledger position, record) pairs after a cursor; in multi-process mode
+    they are fetched from the replica one page at a time"""
+    if not MULTIPROCESS:
+        yield from INVENTORY[node].scan(item_id, after)
+        return
+    while True:
+        reply = replica_client.call(node, {"phase": "query", "item_id": item_id,
+                                           "after": after, "limit": QUERY_PAGE_SIZE})
+        for position, record in reply["page"]:
+            yield position, record
+        if not reply["more"]:
+            return
+        after = reply["page"][-1][0]
+
+def lookup_proven(node, item_id):
+    """Records for item_id, an inclusion proof for each (None if the node's
+    signed root does not cover it yet) and the signed root they prove against"""
+    if MULTIPROCESS:
+        reply = replica_client.call(node, {"phase": "query", "item_id": item_id, "proofs": True})
+        return reply["records"], reply["proofs"], reply["signed_root"]
+    records = INVENTORY[node].lookup(item_id)
+    signed = signed_roots[node]
+    return records, merkle_trees[node].proofs(records, signed["size"]), signed
+
+def replica_status():
+    replicas = {}
+    for name in nodes:
         try:
-            with open(file_path) as f:
-                inventory[node] = json.load(f)["records"]
-        except json.JSONDecodeError:
-            print(f"Warning: {file_path} contains invalid JSON, skipping.")
-            inventory[node] = []
-    return inventory
-
-INVENTORY = load_inventory_data()
+            replicas[name] = replica_client.call(name, {"phase": "status"})
+        except OSError as e:
+            replicas[name] = {"error": f"Unreachable: {e}"}
+    return replicas
 
 @app.route('/')
 def index():
@@ -173,162 +294,238 @@ def get_node_info():
 
 @app.route('/api/query', methods=['POST'])
 def handle_query():
-    global INVENTORY
-    INVENTORY = load_inventory_data()
-    
     data = request.json
     node_id = data.get('node')
     item_id = data.get('item_id')
 
-    if node_id not in INVENTORY:
+    if node_id not in nodes:
         return jsonify({"error": "Invalid node ID"}), 400
 
+    # Optional paging: cursor is the last ledger position already seen
+    cursor = data.get('cursor')
+    limit = data.get('limit')
+    stream = data.get('stream') or "application/x-ndjson" in request.headers.get("Accept", "")
+    if (cursor is not None and (not isinstance(cursor, int) or cursor < -1)) or \
+            (limit is not None and (not isinstance(limit, int) or not 1 <= limit <= QUERY_MAX_PAGE_SIZE)):
+        return jsonify({"error": f"cursor must be an integer >= -1 and limit 1-{QUERY_MAX_PAGE_SIZE}"}), 400
+    after = -1 if cursor is None else cursor
+
+    if stream:
+        # One JSON result per line, produced as the index is walked
+        def generate():
+            for position, record in scan_records(node_id, item_id, after):
+                result = format_result(record, item_id)
+                if result is not None:
+                    result["cursor"] = position
+                    yield json.dumps(result) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if cursor is None and limit is None:
+        results = [result for result in (format_result(record, item_id)
+                                         for _, record in scan_records(node_id, item_id))
+                   if result is not None]
+        return jsonify({
+            "success": True,
+            "node_queried": node_id,
+            "item_id": item_id,
+            "count": len(results),
+            "results": results
+        })
+
+    limit = limit or QUERY_PAGE_SIZE
     results = []
-    for record in INVENTORY[node_id]:
-        try:
-            if "record" not in record or not isinstance(record["record"], str):
-                continue
-            parts = record["record"].split(":")
-            if not item_id or (len(parts) >= 2 and parts[1] == item_id):
-                result = {
-                    "node_id": parts[0],
-                    "item_id": parts[1],
-                    "quantity": int(parts[2]) if len(parts) > 2 else None,
-                    "price": int(parts[3]) if len(parts) > 3 else None,
-                    "signature": record.get("signature"),
-                    "status": record.get("status") or f"Verified by {record.get('verified_by')}",
-                    "is_primary": record.get("is_primary", False),
-                    "partial_signatures": record.get("partial_signatures", []),
-
-                }
-                results.append(result)
-        except (KeyError, AttributeError):
+    last_position = next_cursor = None
+    for position, record in scan_records(node_id, item_id, after):
+        result = format_result(record, item_id)
+        if result is None:
             continue
-
-    unique_results = list({json.dumps(record, sort_keys=True) for record in results})
-    unique_results = [json.loads(r) for r in unique_results]
+        if len(results) == limit:
+            next_cursor = last_position  # There is at least one more result
+            break
+        results.append(result)
+        last_position = position
 
     return jsonify({
         "success": True,
         "node_queried": node_id,
         "item_id": item_id,
         "count": len(results),
-        "results": results
+        "results": results,
+        "next_cursor": next_cursor
     })
 
 
+def format_result(record, item_id):
+    """The /api/query view of a committed record, or None if it doesn't match"""
+    try:
+        if "record" not in record or not isinstance(record["record"], str):
+            return None
+        parts = record["record"].split(":")
+        if item_id and (len(parts) < 2 or parts[1] != item_id):
+            return None
+        return {
+            "node_id": parts[0],
+            "item_id": parts[1],
+            "quantity": int(parts[2]) if len(parts) > 2 else None,
+            "price": int(parts[3]) if len(parts) > 3 else None,
+            "signature": record.get("signature"),
+            "status": record.get("status") or f"Verified by {record.get('verified_by')}",
+            "is_primary": record.get("is_primary", False),
+            "partial_signatures": record.get("partial_signatures", []),
+        }
+    except (KeyError, AttributeError, IndexError, ValueError):
+        return None
+
+
 def get_primary_node(view_number):
     if not nodes:  # Handle empty node list
         return None
     return list(nodes.keys())[view_number % len(nodes)]
 
 def get_db(node):
-    os.makedirs("Task2/Part3/database", exist_ok=True)
-    path = os.path.join("Task2/Part3", "database", f"node_{node.lower()}.json")
-    if not os.path.exists(path):
-        return {"records": []}
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except:
-        return {"records": []}
+    start = time.perf_counter()
+    data = ledgers[node].export()
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="read")
+    return data
 
 def save_db(node, data):
-    os.makedirs("Task2/Part3/database", exist_ok=True)
-    path = os.path.join("Task2/Part3", "database", f"node_{node.lower()}.json")
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=1)
-        
-
-
-# Route for submitting a record
-# In app.py
-
-@app.route('/submit', methods=['POST'])
-def submit():
-    global global_sequence_number
-    data = request.json
-    node = data.get("node")
-    record = data.get("record")
-    
-    print("Received a submit POST request")
-
+    start = time.perf_counter()
+    ledgers[node].replace(data["records"])
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="replace")
+    INVENTORY[node] = build_index(node, data["records"])
+    merkle_trees[node] = MerkleTree(data["records"])
+
+def append_db(node, record):
+    # Committing a record is a single append, independent of ledger size;
+    # returns the ticket to acknowledge it with
+    start = time.perf_counter()
+    ticket = ledgers[node].append(record)
+    DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="append")
+    INVENTORY[node].add(record)
+    merkle_trees[node].add(record)
+    return ticket
+
+def wait_durable(tickets):
+    """Acknowledge commits: True once each node's records up to its ticket
+    ({node: ticket}) are on disk; always False in relaxed mode"""
+    durable = True
+    for node, ticket in tickets.items():
+        start = time.perf_counter()
+        durable = ledgers[node].wait_durable(ticket) and durable
+        DB_SECONDS.observe(time.perf_counter() - start, node=node, operation="sync")
+    return durable
+
+
+def take_checkpoint(sequence, records):
+    """Fold an applied sequence into every node's state digest; at a checkpoint
+    boundary the nodes exchange signed checkpoints and, once 2f+1 match,
+    drop every logged message at or below it"""
+    votes = []
+    for name in nodes:
+        if checkpoints[name].applied(sequence, records):
+            digest = checkpoints[name].state_digest
+            votes.append((name, digest, nodes[name].sign(checkpoint_message(sequence, digest))))
+            sign_merkle_root(name, sequence)
 
+    for name in nodes:
+        for sender, digest, signature in votes:
+            if sender != name and not nodes[name].verify(checkpoint_message(sequence, digest), signature, sender):
+                continue
+            if checkpoints[name].add_vote(sequence, digest, sender, signature):
+                nodes[name].discard_below(sequence)
 
-    if not node or not record or node not in nodes:
-        return jsonify({"error": "Invalid input"}), 400
-    print(f"Request JSON data: {data}")
 
+def run_consensus(node, records):
+    """Order a batch of records with one PBFT instance and one sequence number"""
     # Check if this node is the primary for the current view
     current_view = nodes[node].view_number
-    primary_node = get_primary_node(current_view)
     is_primary = (node == get_primary_node(current_view))
 
-   
-     # Use global sequence number and increment it
-    global_sequence_number += 1
-    sequence_number = global_sequence_number
-    
+    # Take the next sequence number, waiting if the watermark window is full
+    sequence_number = sequence_window.acquire()
+
     # Update the node's sequence number to match (for consistency)
     nodes[node].sequence_number = sequence_number
 
+    committed_records = []
+    tickets = {}  # {node: ticket of its last append}
+
+    def apply():
+        # Runs once every lower sequence number has been applied
+        start = time.perf_counter()
+        for committed_record in committed_records:
+            inventory_ledger.append(committed_record)
+            for name in nodes:
+                tickets[name] = append_db(name, committed_record)
+        PHASE_SECONDS.observe(time.perf_counter() - start, phase="persist")
+        take_checkpoint(sequence_number, [r["record"] for r in committed_records])
+
+    receipts = None
+    try:
+        receipts = _run_phases(node, records, sequence_number, current_view, is_primary, committed_records)
+    finally:
+        sequence_window.complete(sequence_number, apply)
+        # Waited for outside the window lock, so later sequences keep
+        # appending into the same group meanwhile
+        durable = wait_durable(tickets) if tickets else False
+        commit_notifier.publish(sequence_number, "committed" if tickets else "failed")
+    for receipt in receipts:
+        receipt["durable"] = durable
+    return receipts
+
+
+def _run_phases(node, records, sequence_number, current_view, is_primary, committed_records):
     # --- Phase 1: Pre-Prepare ---
-    # sequence_number = nodes[node].sequence_number + 1
-    # nodes[node].sequence_number = sequence_number
-    signature = nodes[node].sign(record)
-    
-    print(f"signature: {signature}")
+    # Every message of this instance shares one Payload (batch text + digest)
+    phase_start = time.perf_counter()
+    batch = Payload(batch_message(records))
+    payload = batch.text
+    signature = nodes[node].sign(payload)
+
+    print(f"signature: {signature} ({len(records)} record batch)")
 
 
     # Store pre-prepare message
-    pre_prepare = {
-        'sequence': sequence_number,
-        'view': current_view,
-        'phase': 'pre-prepare',
-        'record': record,
-        'signature': signature,
-        'sender': node,
-        'is_primary': is_primary
-    }
+    pre_prepare = PrePrepare(sequence_number, current_view, batch, signature, node, is_primary)
     nodes[node].message_log.append(pre_prepare)
+    PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="pre-prepare")
 
     # --- Phase 2: Prepare ---
+    phase_start = time.perf_counter()
     prepare_messages = []
     for name in nodes:
         if name == node:
             continue
 
         # Each replica verifies the pre-prepare
-        if not nodes[name].verify(record, signature, node):
+        if not nodes[name].verify(payload, signature, node):
             continue
 
-        prepare = {
-            'sequence': sequence_number,
-            'view': current_view,
-            'phase': 'prepare',
-            'record': record,
-            'signature': nodes[name].sign(f"{sequence_number}:{current_view}:{record}"),
-            'sender': name
-        }
+        prepare = Prepare(sequence_number, current_view, batch,
+                          nodes[name].sign(f"{sequence_number}:{current_view}:{payload}"), name)
         nodes[name].prepare_messages[(sequence_number, current_view)] = prepare
         nodes[name].message_log.append(prepare)
         prepare_messages.append(prepare)
 
+    PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="prepare")
+
+    # Fast path: the pre-prepare plus a prepare from every backup means all
+    # 3f+1 replicas agree, so the instance commits without a commit round and
+    # the prepares are its certificate
+    fast = FAST_PATH and len(prepare_messages) == len(nodes) - 1
+
     # --- Phase 3: Commit ---
-        commit_messages = []
+    phase_start = time.perf_counter()
+    commit_messages = []
     partial_signatures = []
 
-    if len(prepare_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
+    if fast:
+        partial_signatures = [{"signature": str(prepare.signature), "signed_by": prepare.sender}
+                              for prepare in prepare_messages]
+    elif len(prepare_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
         for name in nodes:
-            commit_signature = nodes[name].sign(f"commit:{sequence_number}:{record}")
-            commit = {
-                'sequence': sequence_number,
-                'view': current_view,
-                'phase': 'commit',
-                'record': record,
-                'signature': commit_signature,
-                'sender': name
-            }
+            commit_signature = nodes[name].sign(f"commit:{sequence_number}:{payload}")
+            commit = Commit(sequence_number, current_view, batch, commit_signature, name)
             nodes[name].commit_messages[(sequence_number, current_view)] = commit
             nodes[name].message_log.append(commit)
             commit_messages.append(commit)
@@ -336,83 +533,200 @@ def submit():
             # Collect partial signature and who signed it
             partial_signatures.append({
                 "signature": str(commit_signature),
-                "signed_by": name   
+                "signed_by": name
             })
 
-        # Save the record only once consensus is reached
-        committed_record = {
-            "record": record,
-            "signature": str(signature),
-            "status": "committed",
-            "verified_by": "PBFT",
-            "sequence": sequence_number,
-            "view": current_view,
-            "timestamp": datetime.datetime.utcnow().isoformat(),
-            "is_primary": is_primary,
-            "partial_signatures": partial_signatures  # <-- ADD this line
-        }
-
-        inventory_ledger.append(committed_record)
-
+        PHASE_SECONDS.observe(time.perf_counter() - phase_start, phase="commit")
 
     # --- Check if consensus threshold met ---
     print(f"Commit messages count: {len(commit_messages)}")
-    if len(commit_messages) + 1 >= REQUIRED_APPROVALS:  # +1 for primary
-        status = "committed"
-        # Apply to all nodes' databases
-        for name in nodes:
-            db = get_db(name)
-            db["records"].append({
+    commit_path = "fast" if fast else "normal"
+    status = "committed" if fast or len(commit_messages) + 1 >= REQUIRED_APPROVALS else "pending"  # +1 for primary
+    if status == "committed":
+        COMMIT_PATHS.inc(path=commit_path)
+
+    # Serialised once and shared by every receipt in the batch
+    prepares = [message.to_dict() for message in prepare_messages]
+    commits = [message.to_dict() for message in commit_messages]
+    receipts = []
+    for position, record in enumerate(records):
+        if status == "committed":
+            committed_record = {
                 "record": record,
                 "signature": str(signature),
                 "status": "committed",
                 "verified_by": "PBFT",
                 "sequence": sequence_number,
+                "batch_position": position,
+                "batch_size": len(records),
                 "view": current_view,
                 "timestamp": datetime.datetime.now().isoformat(),
                 "is_primary": is_primary,
-                "partial_signatures": partial_signatures  # <-- ADD this line
+                "signed_by": node,
+                "partial_signatures": partial_signatures,
+                "commit_path": commit_path
+            }
+            committed_records.append(committed_record)
+
+        receipts.append({
+            "status": f"Consensus {status}",
+            "record_status": status,
+            "record": record,
+            "signature": str(signature),
+            "sequence": sequence_number,
+            "batch_position": position,
+            "batch_size": len(records),
+            "view": current_view,
+            "prepares_count": len(prepare_messages),
+            "commits_count": len(commit_messages),
+            "commit_path": commit_path,
+            "prepares": prepares,
+            "commits": commits,
+            "is_primary": is_primary
+        })
+    return receipts
+
+
+def forward_to_primary(node, records):
+    """Multi-process mode: have the primary replica order the batch"""
+    primary = get_primary_node(nodes[node].view_number)
+    reply = replica_client.call(primary, {"phase": "request", "records": records},
+                                timeout=REPLICA_TIMEOUT * 2)
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    for receipt in reply["receipts"]:
+        receipt["is_primary"] = (node == primary)
+    receipt = reply["receipts"][0]
+    commit_notifier.publish(receipt["sequence"], "committed" if receipt["record_status"] == "committed" else "failed")
+    return reply["receipts"]
+
+
+batcher = RequestBatcher(forward_to_primary if MULTIPROCESS else run_consensus,
+                         BATCH_MAX_SIZE, BATCH_MAX_WAIT)
+
+
+# Last request and reply per client, so retransmitted submits are answered
+# without another consensus round
+client_table = ClientTable()
+REPLAYED_REPLIES = REGISTRY.counter(
+    "pbft_replayed_replies_total", "Submits answered from the client table instead of running consensus")
+
+def answer_retransmission(client_id, timestamp):
+    """The response to a retransmitted or stale submit, or None for a new one"""
+    state, reply = client_table.check(client_id, timestamp, CLIENT_REPLY_WAIT)
+    if state == STALE:
+        return jsonify({"error": "Stale request: this client has already sent a newer one"}), 409
+    if state == REPLAY:
+        if reply is None:
+            return jsonify({"error": "The original request failed or is still being ordered, retry"}), 503
+        REPLAYED_REPLIES.inc()
+        return jsonify(reply)
+    return None
+
+
+# Route for submitting a record
+# In app.py
+
+@app.route('/submit', methods=['POST'])
+def submit():
+    data = request.json
+    node = data.get("node")
+    record = data.get("record")
+
+    print("Received a submit POST request")
+
+
+
+    # Records are joined with newlines to form a batch, so they can't contain one
+    if not node or not isinstance(record, str) or not record or "\n" in record or node not in nodes:
+        return jsonify({"error": "Invalid input"}), 400
+    try:
+        client_id, timestamp = request_id(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if client_id is not None:
+        response = answer_retransmission(client_id, timestamp)
+        if response is not None:
+            return response
+    print(f"Request JSON data: {data}")
+
+    receipt = None
+    try:
+        receipt = batcher.submit(node, record)
+        return jsonify(receipt)
+    except (OSError, RuntimeError) as e:
+        # Only raised in multi-process mode, when replicas are down or slow
+        return jsonify({"error": f"Consensus failed: {e}"}), 503
+    finally:
+        if client_id is not None:
+            client_table.finish(client_id, timestamp, receipt)
+
+
+# Push notifications: clients wait for their sequence number to finish
+# instead of polling /status
+@app.route('/commits/wait')
+def commit_wait():
+    """Long-poll: answers as soon as the sequence commits or fails, or with
+    state "pending" once the timeout runs out"""
+    sequence = request.args.get("sequence", type=int)
+    if sequence is None:
+        return jsonify({"error": "sequence is required"}), 400
+    timeout = request.args.get("timeout", COMMIT_WAIT_TIMEOUT, type=float)
+    timeout = min(max(timeout, 0), COMMIT_WAIT_TIMEOUT)
+    return jsonify({"sequence": sequence, "state": commit_notifier.wait(sequence, timeout)})
+
+@app.route('/commits/stream')
+def commit_stream():
+    """Server-sent events, one "commit" event per finished sequence number.
+    With ?sequence=N the stream ends after N's event. Reconnecting clients
+    resume from Last-Event-ID."""
+    sequence = request.args.get("sequence", type=int)
+    resume_from = request.headers.get("Last-Event-ID", type=int)
+
+    def generate():
+        # Take the position before checking, so an outcome published in
+        # between still arrives as an event
+        last_id = commit_notifier.last_id if resume_from is None else resume_from
+        if sequence is not None and resume_from is None:
+            state = commit_notifier.outcome(sequence)
+            if state is not None:
+                yield sse_event(last_id, "commit", json.dumps({"sequence": sequence, "state": state}))
+                return
+        while True:
+            events = commit_notifier.events_after(last_id, COMMIT_STREAM_KEEPALIVE)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for last_id, finished, state in events:
+                yield sse_event(last_id, "commit", json.dumps({"sequence": finished, "state": state}))
+                if finished == sequence:
+                    return
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 
-            })
-            save_db(name, db)
-            inventory_ledger.append({
-                "record": record,
-                "signature": str(signature),
-                "status": "committed",
-                "verified_by": "PBFT",
-                "sequence": sequence_number,
-                "view": current_view,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "is_primary": is_primary,
-                "partial_signatures": partial_signatures  # <-- ADD this line
-            })
-    else:
-        status = "pending"
 
-    return jsonify({
-        "status": f"Consensus {status}",
-        "record_status": status,
-        "record": record,
-        "signature": str(signature),
-        "sequence": sequence_number,
-        "view": current_view,
-        "prepares_count": len(prepare_messages),
-        "commits_count": len(commit_messages),
-        "prepares": prepare_messages,
-        "commits": commit_messages,
-        "is_primary": is_primary
-    })
 
-    
-    
-    
-    
 # Route to check system status
 @app.route('/status')
 def status():
     system_status = get_system_status()
     return jsonify(system_status)
 
+@app.route('/metrics')
+def metrics():
+    # In multi-process mode the PBFT phases run in the replicas; merge theirs in
+    replicas = {}
+    if MULTIPROCESS:
+        for name in nodes:
+            try:
+                replicas[name] = replica_client.call(name, {"phase": "metrics"})["metrics"]
+            except OSError:
+                continue
+    return Response(REGISTRY.render(replicas), content_type=CONTENT_TYPE)
+
 @app.route('/view-change', methods=['POST'])
 def view_change():
     data = request.json
@@ -428,10 +742,12 @@ def view_change():
     if node != expected_primary:
         return jsonify({"error": "Only next primary can initiate view change"}), 403
 
-    # Collect prepare and commit messages from the last stable checkpoint
+    # The new primary's stable checkpoint certificate, plus every message logged
+    # since it; anything older was discarded when the checkpoint became stable
+    stable_checkpoint = checkpoints[node].stable if node in checkpoints else None
     checkpoint_messages = []
     for name in nodes:
-        checkpoint_messages.extend(nodes[name].message_log[-10:])  # Last 10 messages as checkpoint
+        checkpoint_messages.extend(message.to_dict() for message in nodes[name].message_log)
 
     # Update all nodes to new view
     for name in nodes:
@@ -442,10 +758,54 @@ def view_change():
         "status": "View changed",
         "new_view": new_view,
         "primary": expected_primary,
+        "stable_checkpoint": stable_checkpoint,
         "checkpoint_messages": checkpoint_messages,
         "old_primary": get_primary_node(new_view - 1)
     })
     
+def audit_ledger(node):
+    """Re-verify every signature in a node's ledger"""
+    # Records in one batch share a sequence number and primary signature
+    batches = defaultdict(list)
+    records = lookup_records(node)
+    for record in records:
+        if isinstance(record.get("record"), str) and record.get("signature"):
+            batches[(record.get("sequence"), record["signature"])].append(record)
+
+    pending = defaultdict(list)  # {signer: [(message, signature, sequence), ...]}
+    for (sequence, signature), batch in batches.items():
+        batch.sort(key=lambda r: r.get("batch_position", 0))
+        payload = batch_message([r["record"] for r in batch])
+        # Older records don't store the primary, but lead with its node id
+        signer = batch[0].get("signed_by") or batch[0]["record"].split(":")[0]
+        pending[signer].append((payload, signature, sequence))
+        certified = certificate_message(sequence, batch[0], payload)
+        for partial in batch[0].get("partial_signatures", []):
+            pending[partial["signed_by"]].append((certified, partial["signature"], sequence))
+
+    failures = []
+    for signer, items in pending.items():
+        if signer not in nodes:
+            failures.extend({"sequence": seq, "signer": signer} for _, _, seq in items)
+            continue
+        failures.extend({"sequence": seq, "signer": signer} for message, sig, seq in items
+                        if not nodes[node].verify(message, sig, signer))
+
+    return {
+        "node": node,
+        "records": len(records),
+        "signatures_checked": sum(len(items) for items in pending.values()),
+        "failures": failures,
+        "valid": not failures
+    }
+
+@app.route('/api/audit')
+def audit():
+    node = request.args.get("node")
+    if node not in nodes:
+        return jsonify({"error": "Invalid node ID"}), 400
+    return jsonify(audit_ledger(node))
+
 @app.route('/api/verify-query', methods=['POST'])
 def verify_query():
     data = request.json
@@ -454,12 +814,15 @@ def verify_query():
     if not item_id:
         return jsonify({"error": "Item ID required"}), 400
     
-    # Get records from all nodes
+    # Get records from all nodes. Records covered by a node's signed Merkle
+    # root come with an inclusion proof; only newer ones are signed afresh
     results = []
     partial_signatures = []
+    merkle_roots = {}
     for node in nodes:
-        db = get_db(node)
-        for record in db["records"]:
+        records, proofs, signed_root = lookup_proven(node, item_id)
+        merkle_roots[node] = signed_root
+        for record, proof in zip(records, proofs):
             try:
                 if "record" not in record or not isinstance(record["record"], str):
                     continue
@@ -470,9 +833,13 @@ def verify_query():
                         "item_id": parts[1],
                         "quantity": int(parts[2]) if len(parts) > 2 else None,
                         "price": int(parts[3]) if len(parts) > 3 else None,
-                        "signature": record.get("signature")
+                        "signature": record.get("signature"),
+                        "proven_by": node if proof else None,
+                        "merkle_proof": proof
                     }) 
-                    
+                    if proof:
+                        continue
+
                     partial_sig = HarnMultiSignature.sign_message(node, record["record"])
                     partial_signatures.append({
                         "node": node,
@@ -488,6 +855,7 @@ def verify_query():
     combined_signature = 1
     for sig in partial_signatures:
         combined_signature = (combined_signature * int(sig["partial_signature"])) % PKG.n
+    proven = sum(1 for result in results if result["merkle_proof"])
 
     # Prepare response data
     response_data = {
@@ -495,28 +863,70 @@ def verify_query():
         "results": results,
         "partial_signatures": partial_signatures,
         "combined_signature": str(combined_signature),
-        "verification_status": "verified" if len(partial_signatures) >= REQUIRED_APPROVALS else "pending"
+        "merkle_roots": merkle_roots,
+        "verification_status": "verified" if proven + len(partial_signatures) >= REQUIRED_APPROVALS else "pending"
     }
     print(f"Response to client: {response_data}")
 
     
-    # Encrypt with Procurement Officer's public key
-    message = json.dumps(response_data).encode()
-    message_int = int.from_bytes(message, 'big')
-    if message_int >= PROCUREMENT_OFFICER.n:
-        message_int = message_int % PROCUREMENT_OFFICER.n
-    encrypted = pow(message_int, PROCUREMENT_OFFICER.e, PROCUREMENT_OFFICER.n)
+    # Encrypt with Procurement Officer's public key. The RSA operation only
+    # wraps a session key, so responses of any size survive intact
+    encrypted = seal(json.dumps(response_data).encode(), PROCUREMENT_OFFICER.n,
+                     PROCUREMENT_OFFICER.e, ENVELOPE_CHUNK_SIZE)
     
     return jsonify({
-        "encrypted_response": str(encrypted),
+        "encrypted_response": encrypted,
         "verification_parameters": {
             "combined_signature": str(combined_signature),
             "partial_signatures": partial_signatures,
+            "merkle_roots": merkle_roots,
             "pkg_n": str(PKG.n),
             "pkg_e": str(PKG.e)
         }
     })
 
+def proof_covers(result, proof):
+    # The proven leaf is "<sequence>:<batch_position>:<record>"; its record
+    # must be the one the result reports
+    try:
+        parts = proof["leaf"].split(":", 2)[2].split(":")
+        return (parts[0] == result["node"] and parts[1] == result["item_id"]
+                and (int(parts[2]) if len(parts) > 2 else None) == result["quantity"]
+                and (int(parts[3]) if len(parts) > 3 else None) == result["price"])
+    except (IndexError, KeyError, ValueError, AttributeError):
+        return False
+
+def check_proofs(response):
+    """Check every Merkle proof in a decrypted verify-query response: the
+    proof must cover the result's record and hash up to a root its node
+    signed. Returns {"checked": count, "failed": [result index, ...]}."""
+    roots = response.get("merkle_roots") or {}
+    checked, failed = 0, []
+    for i, result in enumerate(response.get("results") or []):
+        proof = result.get("merkle_proof")
+        if not proof:
+            continue
+        checked += 1
+        node, signed = result.get("proven_by"), roots.get(result.get("proven_by"))
+        try:
+            valid = (node in nodes and signed is not None and proof_covers(result, proof)
+                     and harn_keys.verify(node, root_message(signed["sequence"], signed["size"], signed["root"]),
+                                          signed["signature"])
+                     and verify_proof(proof["leaf"], proof["path"], signed["root"]))
+        except (KeyError, TypeError, ValueError):
+            valid = False
+        if not valid:
+            failed.append(i)
+    return {"checked": checked, "failed": failed}
+
+def officer_decrypt(value):
+    """The Procurement Officer's RSA private key operation"""
+    po = PROCUREMENT_OFFICER
+    decrypted_int = crt_pow(value, po.p, po.q, po.dp, po.dq, po.qinv)
+    if RSA_CRT_CHECK and decrypted_int != pow(value, po.d, po.n):
+        raise ValueError("CRT decryption mismatch for Procurement Officer")
+    return decrypted_int
+
 @app.route('/api/decrypt', methods=['POST'])
 def decrypt():
     data = request.json
@@ -526,13 +936,19 @@ def decrypt():
         return jsonify({"error": "Missing encrypted message"}), 400
     
     try:
-        encrypted_int = int(encrypted)
-        if encrypted_int >= PROCUREMENT_OFFICER.n:
-            encrypted_int = encrypted_int % PROCUREMENT_OFFICER.n
-        
-        decrypted_int = pow(encrypted_int, PROCUREMENT_OFFICER.d, PROCUREMENT_OFFICER.n)
-        byte_length = (decrypted_int.bit_length() + 7) // 8
-        decrypted_bytes = decrypted_int.to_bytes(byte_length, 'big')
+        if is_envelope(encrypted):
+            # verify-query responses: authenticated, then decrypted chunk by chunk
+            decrypted_bytes = b"".join(open_chunks(encrypted, PROCUREMENT_OFFICER.n, officer_decrypt,
+                                                   ENVELOPE_CHUNK_SIZE))
+        else:
+            # A bare RSA ciphertext integer
+            encrypted_int = int(encrypted)
+            if encrypted_int >= PROCUREMENT_OFFICER.n:
+                encrypted_int = encrypted_int % PROCUREMENT_OFFICER.n
+
+            decrypted_int = officer_decrypt(encrypted_int)
+            byte_length = (decrypted_int.bit_length() + 7) // 8
+            decrypted_bytes = decrypted_int.to_bytes(byte_length, 'big')
         
         try:
             # Try UTF-8 first
@@ -543,11 +959,15 @@ def decrypt():
 
             try:
                 decrypted_data = json.loads(plaintext)
-                return jsonify({
+                reply = {
                     "success": True,
                     "decrypted": decrypted_data,
                     "format": "json"
-                })
+                }
+                if isinstance(decrypted_data, dict) and "merkle_roots" in decrypted_data:
+                    # A verify-query response: its proofs stand in for per-record signatures
+                    reply["merkle_verification"] = check_proofs(decrypted_data)
+                return jsonify(reply)
             except json.JSONDecodeError:
                 return jsonify({
                     "success": True,
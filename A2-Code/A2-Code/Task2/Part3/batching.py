@@ -0,0 +1,72 @@
+"""Request batching: many client records ordered by one PBFT instance.
+
+The first request to arrive for a node opens a batch and becomes its leader.
+If no other batch is being ordered, the leader seals its batch at once, so
+a lone request never waits. Otherwise it gathers records until the batch is
+full or the time window closes. It then runs consensus once for every record
+gathered and hands each waiting request its receipt.
+"""
+import threading
+
+
+def batch_message(records):
+    # The payload signed for a batch; a batch of one is just the record itself
+    return "\n".join(records)
+
+
+class _Batch:
+    def __init__(self):
+        self.records = []
+        self.receipts = None
+        self.error = None
+        self.sealed = False  # Closed to new records
+        self.done = threading.Event()
+
+
+class RequestBatcher:
+    def __init__(self, process, max_size, max_wait):
+        self.process = process  # process(node, records) -> [receipt, ...]
+        self.max_size = max_size
+        self.max_wait = max_wait  # Seconds a leader waits for more records while others are in flight
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.pending = {}  # {node: open _Batch}
+        self.in_flight = 0  # Batches being ordered right now
+
+    def submit(self, node, record):
+        """Queue a record and block until its batch has been ordered"""
+        with self.lock:
+            batch = self.pending.get(node)
+            is_leader = batch is None
+            if is_leader:
+                batch = self.pending[node] = _Batch()
+            position = len(batch.records)
+            batch.records.append(record)
+            if len(batch.records) >= self.max_size:
+                del self.pending[node]
+                batch.sealed = True
+                self.cond.notify_all()
+
+        if is_leader:
+            with self.cond:
+                if self.in_flight:
+                    # The pipeline is busy anyway, so gather more records
+                    self.cond.wait_for(lambda: batch.sealed, self.max_wait)
+                if self.pending.get(node) is batch:
+                    del self.pending[node]
+                batch.sealed = True
+                self.in_flight += 1
+            try:
+                batch.receipts = self.process(node, batch.records)
+            except Exception as e:
+                batch.error = e
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.receipts[position]
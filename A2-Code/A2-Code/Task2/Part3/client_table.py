@@ -0,0 +1,66 @@
+"""PBFT client table: the latest request and reply of every client.
+
+Clients tag each submit with a client_id and a timestamp that grows with
+every new request. A retransmission (same timestamp) gets the cached reply,
+waiting for it if the original is still being ordered, instead of another
+consensus round and another ledger append. Anything older than the client's
+latest request is stale.
+"""
+import threading
+
+NEW, REPLAY, STALE = "new", "replay", "stale"
+
+
+class _Entry:
+    __slots__ = ("timestamp", "reply", "done")
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.reply = None
+        self.done = threading.Event()
+
+
+def request_id(data):
+    """(client_id, timestamp) from a submit body, (None, None) for clients that
+    send neither; ValueError if they are malformed"""
+    client_id, timestamp = data.get("client_id"), data.get("timestamp")
+    if client_id is None and timestamp is None:
+        return None, None
+    if not isinstance(client_id, str) or not client_id or isinstance(timestamp, bool) \
+            or not isinstance(timestamp, (int, float)):
+        raise ValueError("client_id must be a string and timestamp a number")
+    return client_id, timestamp
+
+
+class ClientTable:
+    def __init__(self):
+        self.entries = {}  # {client_id: _Entry}
+        self.lock = threading.Lock()
+
+    def check(self, client_id, timestamp, wait):
+        """(NEW, None) if the request should be ordered, (REPLAY, reply) for a
+        retransmission, (STALE, None) if the client already sent a newer one.
+        A replayed reply is None if the original failed or is still running
+        after wait seconds."""
+        with self.lock:
+            entry = self.entries.get(client_id)
+            if entry is None or timestamp > entry.timestamp:
+                self.entries[client_id] = _Entry(timestamp)
+                return NEW, None
+            if timestamp < entry.timestamp:
+                return STALE, None
+        entry.done.wait(wait)
+        return REPLAY, entry.reply
+
+    def finish(self, client_id, timestamp, reply):
+        """Cache the reply to a NEW request; reply None (it failed) forgets the
+        request so a retry runs it again"""
+        with self.lock:
+            entry = self.entries.get(client_id)
+            if entry is None or entry.timestamp != timestamp:
+                return
+            if reply is None:
+                del self.entries[client_id]
+            else:
+                entry.reply = reply
+        entry.done.set()
@@ -1,4 +1,5 @@
 """Configuration for Harn Identity-Based Multi-Signature System"""
+import os
 
 class PKGConfig:
     def __init__(self):
@@ -17,6 +18,7 @@ class NodeConfig:
         self.p = p
         self.q = q
         self.e = e
+        self.n = p * q
 
 class ProcurementOfficer:
     def __init__(self):
@@ -26,6 +28,10 @@ class ProcurementOfficer:
         self.n = self.p * self.q
         self.phi_n = (self.p - 1) * (self.q - 1)
         self.d = pow(self.e, -1, self.phi_n)  # Private key
+        # CRT parameters for fast decryption
+        self.dp = self.d % (self.p - 1)
+        self.dq = self.d % (self.q - 1)
+        self.qinv = pow(self.q, -1, self.p)
 
 # System Configuration
 PKG = PKGConfig()
@@ -60,3 +66,74 @@ CONSENSUS_PROTOCOL = "PBFT"
 MAX_FAULTY_NODES = 1  # f=1 for 4 nodes # Ref: https://www.geeksforgeeks.org/minimum-number-of-nodes-to-achieve-byzantine-fault-tolerance/
 REQUIRED_APPROVALS = 2 * MAX_FAULTY_NODES + 1  # 3 for f=1
 CONSENSUS_THRESHOLD = .75  # Honest Nodes ≥ (Total Nodes / 3) * 2 --> (4/3) * 2 --> (8/3) --> 2.667 out of 4 --> Honest Nodes ≥ 2.66 out of 4 --> 3 out of 4 (round up) --> 0.75
+
+# Request batching: the primary orders up to BATCH_MAX_SIZE records per PBFT
+# instance. A batch is sealed at once when no other is in flight; otherwise
+# it gathers records for at most BATCH_MAX_WAIT seconds
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT = 0.005
+
+# Pipelining: at most PIPELINE_WINDOW consensus instances may be in flight,
+# i.e. sequence numbers stay within (low watermark, low + PIPELINE_WINDOW]
+PIPELINE_WINDOW = 8
+
+# Replicas sign a checkpoint every CHECKPOINT_INTERVAL sequence numbers; once
+# 2f+1 agree it is stable and older message log entries are discarded
+CHECKPOINT_INTERVAL = 16
+
+# Records per chunk when a lagging replica fetches missing state from a peer
+STATE_TRANSFER_CHUNK = 256
+
+# /api/query pagination: default and largest page size
+QUERY_PAGE_SIZE = 100
+QUERY_MAX_PAGE_SIZE = 1000
+
+# Longest a /commits/wait long-poll blocks, and the gap between keep-alive
+# comments on an idle /commits/stream, in seconds
+COMMIT_WAIT_TIMEOUT = 30
+COMMIT_STREAM_KEEPALIVE = 15
+# Finished sequence numbers whose outcome the notifier remembers
+COMMIT_NOTIFY_HISTORY = 4096
+
+# How long a retransmitted submit waits for the original's reply, in seconds
+CLIENT_REPLY_WAIT = 30
+
+# Bytes per keystream/MAC chunk when envelope-encrypting verify-query responses
+ENVELOPE_CHUNK_SIZE = 64 * 1024
+
+# Recompute every CRT signature/decryption the plain pow(m, d, n) way and
+# raise on mismatch. Slow; only for validating the CRT path.
+RSA_CRT_CHECK = False
+
+# Window size (bits) of the fixed-base tables used for r_i^h in Harn signing
+HARN_WINDOW_BITS = 4
+
+# Deployment mode. "inprocess" runs all four nodes inside app.py;
+# "multiprocess" runs each node as its own process (python replica.py) and
+# app.py only forwards client requests to them.
+PBFT_MODE = os.environ.get("PBFT_MODE", "inprocess")
+REPLICA_HOST = "127.0.0.1"
+REPLICA_PORTS = {"A": 7001, "B": 7002, "C": 7003, "D": 7004}
+REPLICA_TIMEOUT = 10  # Seconds to wait for a replica or for consensus
+
+# Where node ledgers are stored: "segment" (append-only node_x.ledger files)
+# or "sqlite" (one WAL-mode SQLite database, queried through its indexes)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "segment")
+
+# When a commit counts as durable: "strict" fsyncs every commit, "group"
+# fsyncs straight away when no fsync is running and otherwise lets the
+# commits that arrive meanwhile share the next one, "relaxed" leaves them in
+# the OS page cache. Group mode also syncs records nobody waits on after
+# GROUP_COMMIT_INTERVAL seconds or GROUP_COMMIT_SIZE records. Submits are
+# only acknowledged as durable once their fsync has finished.
+DURABILITY = os.environ.get("DURABILITY", "group")
+GROUP_COMMIT_INTERVAL = 0.005
+GROUP_COMMIT_SIZE = 64
+
+# Speculative fast path: an instance whose pre-prepare gets a matching prepare
+# from every other replica (all 3f+1 agree) commits without the commit round,
+# and its prepares become the commit certificate. A replica still missing
+# prepares FAST_PATH_TIMEOUT seconds after it prepared falls back to the
+# normal commit phase.
+FAST_PATH = os.environ.get("FAST_PATH", "off") == "on"
+FAST_PATH_TIMEOUT = 0.05
@@ -0,0 +1,83 @@
+"""Hybrid (envelope) encryption to an RSA public key, for payloads of any size.
+
+RSA is applied once, to a random session key below the modulus. Two
+SHA-256-derived keys come out of the session key. One drives a SHAKE-256
+keystream that is XORed over the payload in fixed-size chunks, one
+keystream block per chunk index. The other keys an HMAC-SHA256 over the
+header and the ciphertext, which is checked before anything is decrypted.
+
+The sealed form is one string, "env1.<wrapped key hex>.<nonce>.<ciphertext>.<tag>",
+with the last three fields base64url encoded.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+
+PREFIX = "env1"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _derive_keys(session_key, n):
+    key_bytes = session_key.to_bytes((n.bit_length() + 7) // 8, "big")
+    return hashlib.sha256(b"enc" + key_bytes).digest(), hashlib.sha256(b"mac" + key_bytes).digest()
+
+
+def _xor_chunk(enc_key, nonce, index, chunk):
+    stream = hashlib.shake_256(enc_key + nonce + index.to_bytes(8, "big")).digest(len(chunk))
+    return (int.from_bytes(chunk, "big") ^ int.from_bytes(stream, "big")).to_bytes(len(chunk), "big")
+
+
+def _mac(mac_key, wrapped_hex, nonce):
+    return hmac.new(mac_key, f"{PREFIX}.{wrapped_hex}.".encode() + nonce, hashlib.sha256)
+
+
+def is_envelope(text):
+    return isinstance(text, str) and text.startswith(PREFIX + ".")
+
+
+def seal(plaintext, n, e, chunk_size):
+    """Encrypt bytes to the RSA public key (n, e)"""
+    session_key = secrets.randbelow(n - 2) + 2
+    wrapped_hex = format(pow(session_key, e, n), "x")
+    enc_key, mac_key = _derive_keys(session_key, n)
+    nonce = secrets.token_bytes(16)
+    mac = _mac(mac_key, wrapped_hex, nonce)
+    chunks = []
+    for index, start in enumerate(range(0, len(plaintext), chunk_size)):
+        chunk = _xor_chunk(enc_key, nonce, index, plaintext[start:start + chunk_size])
+        mac.update(chunk)
+        chunks.append(chunk)
+    return ".".join([PREFIX, wrapped_hex, _b64encode(nonce), _b64encode(b"".join(chunks)), _b64encode(mac.digest())])
+
+
+def open_chunks(envelope, n, unwrap, chunk_size):
+    """Decrypt a sealed envelope chunk by chunk. unwrap(c) is the RSA private
+    key operation. Raises ValueError if the envelope is malformed or was
+    tampered with; the tag is checked before the first chunk is yielded."""
+    try:
+        prefix, wrapped_hex, nonce, ciphertext, tag = envelope.split(".")
+        wrapped = int(wrapped_hex, 16)
+        nonce, ciphertext, tag = _b64decode(nonce), _b64decode(ciphertext), _b64decode(tag)
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Malformed envelope: {e}") from e
+    if prefix != PREFIX or wrapped >= n:
+        raise ValueError("Malformed envelope")
+
+    enc_key, mac_key = _derive_keys(unwrap(wrapped), n)
+    mac = _mac(mac_key, wrapped_hex, nonce)
+    view = memoryview(ciphertext)
+    for start in range(0, len(view), chunk_size):
+        mac.update(view[start:start + chunk_size])
+    if not hmac.compare_digest(mac.digest(), tag):
+        raise ValueError("Envelope authentication failed")
+
+    for index, start in enumerate(range(0, len(view), chunk_size)):
+        yield _xor_chunk(enc_key, nonce, index, bytes(view[start:start + chunk_size]))
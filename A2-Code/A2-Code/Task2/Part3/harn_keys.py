@@ -0,0 +1,75 @@
+"""Precomputed Harn key material.
+
+A node's secret key g_i = ID_i^d mod n and its random value r_i never change,
+so they are derived once. pow(r_i, h, n) always uses the same base, so each
+node keeps a fixed-base window table and a partial signature then costs one
+multiplication per window of h instead of a full square-and-multiply.
+"""
+import hashlib
+
+
+class FixedBaseTable:
+    def __init__(self, base, modulus, max_bits, window=4):
+        self.modulus = modulus
+        self.window = window
+        self.mask = (1 << window) - 1
+        # rows[j][k] = base^(k * 2^(window*j)) mod modulus
+        self.rows = []
+        row_base = base % modulus
+        for _ in range((max_bits + window - 1) // window):
+            row = [1]
+            for _ in range(self.mask):
+                row.append((row[-1] * row_base) % modulus)
+            self.rows.append(row)
+            row_base = (row[-1] * row_base) % modulus
+        self.max_exponent = 1 << (len(self.rows) * window)
+
+    def pow(self, exponent):
+        if exponent < 0 or exponent >= self.max_exponent:
+            raise ValueError("Exponent out of range for fixed-base table")
+        result = 1
+        for row in self.rows:
+            if not exponent:
+                break
+            digit = exponent & self.mask
+            if digit:
+                result = (result * row[digit]) % self.modulus
+            exponent >>= self.window
+        return result
+
+
+class HarnKeyStore:
+    def __init__(self, pkg, node_configs, window=4):
+        self.pkg = pkg
+        self.identities = {node_id: node.identity for node_id, node in node_configs.items()}
+        # t_i = r_i^e mod n, the public commitment a partial signature is checked against
+        self.commitments = {node_id: pow(node.random_val, pkg.e, pkg.n) for node_id, node in node_configs.items()}
+        self.secret_keys = {}  # {identity: g}
+        self.tables = {
+            node_id: FixedBaseTable(node.random_val, pkg.n, pkg.n.bit_length(), window)
+            for node_id, node in node_configs.items()
+        }
+        for node in node_configs.values():
+            self.secret_key(node.identity)
+
+    def secret_key(self, identity):
+        """g = identity^d mod n, derived once per identity"""
+        g = self.secret_keys.get(identity)
+        if g is None:
+            g = self.secret_keys[identity] = pow(identity, self.pkg.d, self.pkg.n)
+        return g
+
+    def random_pow(self, node_id, exponent):
+        """r_i^exponent mod n from the node's fixed-base table"""
+        return self.tables[node_id].pow(exponent)
+
+    def sign(self, node_id, message):
+        """Harn partial signature g_i * r_i^h mod n on message"""
+        h = int(hashlib.sha256(message.encode()).hexdigest(), 16) % self.pkg.n
+        return (self.secret_key(self.identities[node_id]) * self.random_pow(node_id, h)) % self.pkg.n
+
+    def verify(self, node_id, message, signature):
+        """Check a partial signature from sign(): s^e == identity * t_i^h mod n"""
+        h = int(hashlib.sha256(message.encode()).hexdigest(), 16) % self.pkg.n
+        expected = (self.identities[node_id] * pow(self.commitments[node_id], h, self.pkg.n)) % self.pkg.n
+        return pow(int(signature), self.pkg.e, self.pkg.n) == expected
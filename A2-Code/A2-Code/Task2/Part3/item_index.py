@@ -0,0 +1,55 @@
+"""In-memory index of a node's committed records keyed by item_id"""
+from bisect import bisect_right
+from collections import defaultdict
+
+
+def item_id_of(record):
+    # Records are "node:item:quantity:price"; anything else is not indexed
+    text = record.get("record") if isinstance(record, dict) else None
+    if not isinstance(text, str):
+        return None
+    parts = text.split(":")
+    return parts[1] if len(parts) >= 2 else None
+
+
+class ItemIndex:
+    def __init__(self, records=()):
+        self.records = []  # Every committed record in ledger order
+        self.by_item = defaultdict(list)  # {item_id: [record, ...]}
+        self.positions = defaultdict(list)  # {item_id: [ledger position, ...]}, parallel to by_item
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        """Index one newly committed record"""
+        self.records.append(record)
+        item_id = item_id_of(record)
+        if item_id is not None:
+            self.by_item[item_id].append(record)
+            self.positions[item_id].append(len(self.records) - 1)
+
+    def lookup(self, item_id=None):
+        """Records for item_id in commit order, or every record if no item_id"""
+        if not item_id:
+            return self.records
+        return self.by_item.get(item_id, [])
+
+    def scan(self, item_id=None, after=-1):
+        """Yield (ledger position, record) for item_id, or for every record,
+        starting after ledger position after. Positions never change once a
+        record is committed, so they double as query cursors."""
+        if not item_id:
+            position = after + 1
+            while position < len(self.records):
+                yield position, self.records[position]
+                position += 1
+            return
+        positions = self.positions.get(item_id, [])
+        records = self.by_item.get(item_id, [])
+        i = bisect_right(positions, after)
+        while i < len(positions):
+            yield positions[i], records[i]
+            i += 1
+
+    def __len__(self):
+        return len(self.records)
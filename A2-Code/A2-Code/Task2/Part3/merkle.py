@@ -0,0 +1,116 @@
+"""Incremental Merkle tree over a node's committed records.
+
+Leaves are the consensus-ordered records "<sequence>:<batch_position>:<record>",
+so every honest node builds the same tree. Hashing follows RFC 6962: leaf and
+interior hashes are domain-separated, and the tree over n leaves splits at
+the largest power of two below n. Every complete subtree is kept in levels,
+so the root of any earlier size, and an inclusion proof against it, costs
+O(log^2 n) hashes at most and appending a leaf costs O(1) amortised.
+"""
+import hashlib
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def leaf_text(record):
+    return f"{record['sequence']}:{record.get('batch_position') or 0}:{record['record']}"
+
+
+def leaf_hash(text):
+    return hashlib.sha256(b"\x00" + text.encode()).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def root_message(sequence, size, root):
+    """The text each node signs for its root at a checkpoint"""
+    return f"merkle:{sequence}:{size}:{root}"
+
+
+def _split(size):
+    # Largest power of two strictly below size
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+class MerkleTree:
+    def __init__(self, records=()):
+        self.levels = [[]]  # levels[k][j] hashes leaves [j * 2^k, (j + 1) * 2^k)
+        self.positions = {}  # {(sequence, batch_position): leaf index}
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def add(self, record):
+        """Append a committed record; records without a sequence (seed data) are skipped"""
+        if record.get("sequence") is None or not isinstance(record.get("record"), str):
+            return None
+        key = (record["sequence"], record.get("batch_position") or 0)
+        if key in self.positions:
+            return self.positions[key]
+        index = self.positions[key] = len(self.levels[0])
+        digest = leaf_hash(leaf_text(record))
+        self.levels[0].append(digest)
+        level, i = 0, index
+        while i % 2 == 1:  # This leaf completed a subtree one level up
+            digest = node_hash(self.levels[level][i - 1], digest)
+            level, i = level + 1, i // 2
+            if level == len(self.levels):
+                self.levels.append([])
+            self.levels[level].append(digest)
+        return index
+
+    def index_of(self, record):
+        return self.positions.get((record.get("sequence"), record.get("batch_position") or 0))
+
+    def _subtree(self, start, end):
+        size = end - start
+        level = size.bit_length() - 1
+        if size == 1 << level:
+            return self.levels[level][start >> level]
+        k = _split(size)
+        return node_hash(self._subtree(start, start + k), self._subtree(start + k, end))
+
+    def root(self, size=None):
+        size = len(self) if size is None else size
+        return self._subtree(0, size).hex() if size else EMPTY_ROOT
+
+    def proof(self, index, size=None):
+        """Sibling hashes from leaf index up to the root over the first size
+        leaves, as [["L" or "R", hex digest], ...]"""
+        path = []
+        start, end = 0, len(self) if size is None else size
+        while end - start > 1:
+            k = _split(end - start)
+            if index < start + k:
+                path.append(["R", self._subtree(start + k, end).hex()])
+                end = start + k
+            else:
+                path.append(["L", self._subtree(start, start + k).hex()])
+                start += k
+        path.reverse()
+        return path
+
+    def proofs(self, records, size):
+        """An inclusion proof against the root over size leaves for each
+        record, or None for records that root does not cover"""
+        proofs = []
+        for record in records:
+            index = self.index_of(record)
+            if index is None or index >= size:
+                proofs.append(None)
+            else:
+                proofs.append({"leaf_index": index, "leaf": leaf_text(record), "path": self.proof(index, size)})
+        return proofs
+
+
+def verify_proof(text, path, root):
+    """True if the leaf text hashes up to root along path"""
+    digest = leaf_hash(text)
+    for side, sibling in path:
+        sibling = bytes.fromhex(sibling)
+        digest = node_hash(sibling, digest) if side == "L" else node_hash(digest, sibling)
+    return digest.hex() == root
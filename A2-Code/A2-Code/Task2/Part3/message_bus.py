@@ -0,0 +1,107 @@
+"""asyncio message bus between replica processes.
+
+Each replica runs one event loop thread that keeps a persistent connection
+to every peer. Every peer has its own outgoing queue and writer task, so a
+broadcast returns immediately and a slow or dead peer only holds up its own
+queue. Incoming messages are handed to the replica on worker threads, so an
+instance moves on as soon as the fastest 2f+1 replicas' votes arrive.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from transport import HEADER, encode, frame_length
+
+CLIENT_PHASES = {'request', 'query', 'status', 'fetch', 'metrics'}  # Calls that expect a reply
+
+
+class MessageBus:
+    def __init__(self, name, address, peers, handle_message, protocol_workers, client_workers=32,
+                 reconnect_delay=0.2):
+        self.name = name
+        self.address = address
+        self.peers = peers  # {peer: (host, port)}
+        self.handle_message = handle_message  # handle_message(msg) -> reply or None
+        self.reconnect_delay = reconnect_delay
+        self.loop = asyncio.new_event_loop()
+        # Client requests block until their instance commits, so they get their
+        # own pool and can never starve the protocol messages they wait on
+        self.protocol_executor = ThreadPoolExecutor(protocol_workers, thread_name_prefix=f"{name}-protocol")
+        self.client_executor = ThreadPoolExecutor(client_workers, thread_name_prefix=f"{name}-client")
+        self.queues = {}  # {peer: asyncio.Queue of outgoing messages}
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"{self.name}-bus", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def broadcast(self, message):
+        """Queue a message for every peer and return without waiting; raises
+        ValueError straight away if it is too large to send"""
+        data = encode(message)
+        for queue in self.queues.values():
+            self.loop.call_soon_threadsafe(queue.put_nowait, data)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._start())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _start(self):
+        host, port = self.address
+        self.server = await asyncio.start_server(self._on_connection, host, port, backlog=128)
+        for peer, address in self.peers.items():
+            self.queues[peer] = asyncio.Queue()
+            self.loop.create_task(self._peer_writer(address, self.queues[peer]))
+
+    async def _peer_writer(self, address, queue):
+        # One long-lived connection per peer, re-established whenever it drops
+        writer = None
+        while True:
+            data = await queue.get()
+            while True:
+                try:
+                    if writer is None:
+                        _, writer = await asyncio.open_connection(*address)
+                    writer.write(data)
+                    await writer.drain()
+                    break
+                except OSError:
+                    if writer is not None:
+                        writer.close()
+                    writer = None
+                    await asyncio.sleep(self.reconnect_delay)
+
+    async def _on_connection(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                body = await reader.readexactly(frame_length(header))
+                self.loop.create_task(self._dispatch(json.loads(body), writer))
+        except (asyncio.IncompleteReadError, OSError):
+            pass  # The peer hung up
+        except ValueError as e:
+            # Oversized or malformed: the stream can't be trusted past it
+            print(f"Replica {self.name}: dropping connection: {e}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, message, writer):
+        is_client = message.get('phase') in CLIENT_PHASES
+        executor = self.client_executor if is_client else self.protocol_executor
+        try:
+            reply = await self.loop.run_in_executor(executor, self.handle_message, message)
+        except Exception as e:
+            print(f"Replica {self.name}: error handling {message.get('phase')}: {e}")
+            reply = {"error": str(e)} if is_client else None
+        if reply is not None and not writer.is_closing():
+            try:
+                data = encode(reply)
+            except ValueError as e:
+                print(f"Replica {self.name}: can't reply to {message.get('phase')}: {e}")
+                data = encode({"error": str(e)})
+            writer.write(data)
+            await writer.drain()
@@ -0,0 +1,74 @@
+"""Compact PBFT protocol messages.
+
+Every message of one PBFT instance is about the same request, so its text and
+SHA-256 digest live once in a Payload that the pre-prepare, prepares and
+commits all point to. Messages are slotted objects rather than dicts, so an
+instance costs a handful of small fixed-size objects instead of a dict per
+message per node, each holding its own reference to the record.
+"""
+import hashlib
+import sys
+
+
+class Payload:
+    __slots__ = ("text", "digest")
+
+    def __init__(self, text):
+        self.text = sys.intern(text)  # Repeated records share one string
+        self.digest = hashlib.sha256(self.text.encode()).hexdigest()
+
+
+class Message:
+    __slots__ = ("sequence", "view", "payload", "signature", "sender")
+    phase = None
+
+    def __init__(self, sequence, view, payload, signature, sender):
+        self.sequence = sequence
+        self.view = view
+        self.payload = payload
+        self.signature = signature
+        self.sender = sender
+
+    @property
+    def record(self):
+        return self.payload.text
+
+    @property
+    def digest(self):
+        return self.payload.digest
+
+    def to_dict(self):
+        """JSON form; prepares and commits refer to the request by digest"""
+        return {
+            'sequence': self.sequence,
+            'view': self.view,
+            'phase': self.phase,
+            'digest': self.payload.digest,
+            'signature': self.signature,
+            'sender': self.sender
+        }
+
+
+class PrePrepare(Message):
+    __slots__ = ("is_primary",)
+    phase = 'pre-prepare'
+
+    def __init__(self, sequence, view, payload, signature, sender, is_primary):
+        super().__init__(sequence, view, payload, signature, sender)
+        self.is_primary = is_primary
+
+    def to_dict(self):
+        message = super().to_dict()
+        message['record'] = self.payload.text
+        message['is_primary'] = self.is_primary
+        return message
+
+
+class Prepare(Message):
+    __slots__ = ()
+    phase = 'prepare'
+
+
+class Commit(Message):
+    __slots__ = ()
+    phase = 'commit'
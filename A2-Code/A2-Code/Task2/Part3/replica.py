@@ -0,0 +1,621 @@
+"""A PBFT replica running as its own OS process.
+
+    python replica.py A     # run replica A
+    python replica.py       # run all four replicas, one process each
+
+Replicas exchange pre-prepare/prepare/commit messages over an asyncio message
+bus (message_bus.py) and each appends committed records to its own ledger. Start app.py with
+PBFT_MODE=multiprocess to use it as the client gateway in front of them.
+"""
+import datetime
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
+from config import NODES, REQUIRED_APPROVALS, PIPELINE_WINDOW, REPLICA_HOST, REPLICA_PORTS, REPLICA_TIMEOUT
+from config import CHECKPOINT_INTERVAL, STATE_TRANSFER_CHUNK, PKG, HARN_WINDOW_BITS, STORAGE_BACKEND
+from config import DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE, FAST_PATH, FAST_PATH_TIMEOUT
+from rsa_node import RSANode
+from storage import open_ledger, SQLiteLedger, SQLItemIndex
+from item_index import ItemIndex
+from batching import batch_message
+from pipeline import SequenceWindow
+from message_bus import MessageBus
+from checkpoint import CheckpointTracker, checkpoint_message
+from transport import request
+from state_transfer import records_between, batches, certificate_valid, batch_committed
+from merkle import MerkleTree, root_message
+from harn_keys import HarnKeyStore
+from metrics import REGISTRY, PHASE_SECONDS, DB_SECONDS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_DIR = os.path.join(BASE_DIR, "database")
+
+
+def digest_of(payload):
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Instance:
+    """Protocol state for one (view, sequence) slot on one replica"""
+
+    def __init__(self):
+        self.pre_prepare = None
+        self.payload = None
+        self.prepares = {}  # {sender: message}, checked once the pre-prepare is known
+        self.commits = {}   # {sender: message}
+        self.verified = set()  # {(phase, sender)} whose signatures checked out
+        self.certified_prepares = None  # Verified votes, copied under the lock on commit
+        self.certified_commits = None
+        self.sent_prepare = False
+        self.sent_commit = False
+        self.committed = False
+        self.fast = False  # Committed on the fast path, without a commit round
+        self.fast_expired = False  # Gave up waiting for the last prepares
+        self.fallback = None  # Timer that ends the wait
+        self.applied = threading.Event()
+        self.abandoned = False  # The primary gave up on it; never applied here
+        self.receipts = None
+        self.ticket = None  # Ledger ticket of the last record applied, to acknowledge
+        self.accepted_at = None  # perf_counter() times, for the phase metrics
+        self.prepared_at = None
+
+
+class Replica:
+    def __init__(self, name):
+        self.name = name
+        params = NODES[name]
+        self.node = RSANode(name, params.p, params.q, params.e)
+        self.ledger = open_ledger(name, DB_DIR, STORAGE_BACKEND, DURABILITY, GROUP_COMMIT_INTERVAL, GROUP_COMMIT_SIZE)
+        self.index = self._build_index()
+        self.window = SequenceWindow(PIPELINE_WINDOW, start=max(
+            (r.get("sequence") or 0 for r in self.index.records), default=0))
+        self.checkpoints = CheckpointTracker.from_records(self.index.records, CHECKPOINT_INTERVAL, REQUIRED_APPROVALS)
+        self.due_checkpoints = deque()  # (sequence, digest, merkle size) reached while applying
+        self.tree = MerkleTree(self.index.records)
+        self.harn_keys = HarnKeyStore(PKG, {name: params}, window=HARN_WINDOW_BITS)
+        self.sign_root(self.checkpoints.sequence, len(self.tree))
+        self.instances = {}  # {(view, sequence): Instance}
+        self.lock = threading.Lock()
+        self.catching_up = False
+        self.peers = {peer: (REPLICA_HOST, port) for peer, port in REPLICA_PORTS.items() if peer != name}
+        # Protocol handlers only block while waiting for lower sequences to be
+        # applied, so a couple of workers per in-flight instance is plenty
+        self.bus = MessageBus(name, (REPLICA_HOST, REPLICA_PORTS[name]), self.peers, self.handle,
+                              protocol_workers=2 * PIPELINE_WINDOW + 4)
+        REGISTRY.gauge("pbft_message_log_size", "Messages held in each node's log", ("node",),
+                       collect=lambda: {(name,): len(self.node.message_log)})
+        REGISTRY.gauge("pbft_in_flight_instances", "PBFT instances between pre-prepare and apply",
+                       collect=lambda: {(): self.window.in_flight()})
+        REGISTRY.counter("db_bytes_total", "Bytes read from and written to each node's ledger", ("node", "operation"),
+                         collect=lambda: {(name, "read"): self.ledger.bytes_read,
+                                          (name, "write"): self.ledger.bytes_written})
+        REGISTRY.counter("db_syncs_total", "fsyncs issued to make each node's commits durable", ("node",),
+                         collect=lambda: {(name,): self.ledger.durability.syncs})
+        self.commit_paths = REGISTRY.counter(
+            "pbft_commits_total", "Committed instances by commit path (fast: no commit round)", ("path",))
+
+    def _build_index(self, records=None):
+        # SQLite answers item lookups from its own indexes
+        if isinstance(self.ledger, SQLiteLedger):
+            return SQLItemIndex(self.ledger)
+        return ItemIndex(self.ledger.records() if records is None else records)
+
+    def primary(self):
+        return list(NODES.keys())[self.node.view_number % len(NODES)]
+
+    def serve(self):
+        print(f"Replica {self.name} listening on {REPLICA_HOST}:{REPLICA_PORTS[self.name]}")
+        self.bus.start()
+        self.start_catch_up()  # In case the others committed while this replica was down
+        self.bus.thread.join()
+
+    def broadcast(self, message):
+        self.bus.broadcast(message)
+
+    def handle(self, message):
+        handlers = {
+            'request': self.on_request,
+            'pre-prepare': self.on_protocol_message,
+            'prepare': self.on_protocol_message,
+            'commit': self.on_protocol_message,
+            'checkpoint': self.on_checkpoint,
+            'fetch': self.on_fetch,
+            'query': self.on_query,
+            'status': self.on_status,
+            'metrics': self.on_metrics,
+        }
+        handler = handlers.get(message.get('phase'))
+        if handler is None:
+            return {"error": f"Unknown phase {message.get('phase')!r}"}
+        return handler(message)
+
+    # --- Client requests, handled by the primary ---
+    def on_request(self, message):
+        primary = self.primary()
+        if self.name != primary:
+            return {"error": f"Replica {self.name} is not the primary ({primary})"}
+
+        records = message["records"]
+        view = self.node.view_number
+        sequence = self.window.acquire()
+        self.node.sequence_number = sequence
+        try:
+            start = time.perf_counter()
+            payload = batch_message(records)
+            pre_prepare = {
+                'sequence': sequence,
+                'view': view,
+                'phase': 'pre-prepare',
+                'records': records,
+                'digest': digest_of(payload),
+                'signature': self.node.sign(payload),
+                'sender': self.name
+            }
+            PHASE_SECONDS.observe(time.perf_counter() - start, phase="pre-prepare")
+            self.on_protocol_message(pre_prepare)
+            self.broadcast(pre_prepare)
+
+            instance = self.instances[(view, sequence)]
+            if not instance.applied.wait(REPLICA_TIMEOUT):
+                return {"error": f"Consensus timed out for sequence {sequence}"}
+        finally:
+            self._abandon((view, sequence))
+        # Acknowledged once the batch is durable in this replica's ledger
+        start = time.perf_counter()
+        durable = instance.ticket is not None and self.ledger.wait_durable(instance.ticket, REPLICA_TIMEOUT)
+        DB_SECONDS.observe(time.perf_counter() - start, node=self.name, operation="sync")
+        for receipt in instance.receipts or ():
+            receipt["durable"] = durable
+        return {"receipts": instance.receipts}
+
+    # --- Pre-prepare / prepare / commit ---
+    def on_protocol_message(self, message):
+        self._progress((message['view'], message['sequence']), message)
+        return None
+
+    def _progress(self, key, message=None):
+        """Store message (if any), advance the instance, send whatever that
+        produced and apply the instance if it just committed"""
+        with self.lock:
+            instance = self.instances.setdefault(key, Instance())
+            if message is not None:
+                self._store(instance, message)
+            committed = instance.committed
+            outgoing = self._advance(key, instance)
+            apply_now = instance.committed and not committed
+            if apply_now and instance.abandoned:
+                print(f"Replica {self.name}: sequence {key[1]} committed after it timed out here; not applied")
+                apply_now = False
+
+        for out in outgoing or []:
+            self.broadcast(out)
+        if apply_now:
+            self._apply(key, instance)
+
+    def _abandon(self, key):
+        # Give the watermark slot back unless the instance committed, so
+        # timed-out instances cannot use up the window. The client was told
+        # it failed; if the others still commit it, this replica skips it
+        with self.lock:
+            instance = self.instances.setdefault(key, Instance())
+            if instance.committed:
+                return
+            instance.abandoned = True
+            if instance.fallback is not None:
+                instance.fallback.cancel()
+        self.window.abort(key[1])
+
+    def _fall_back(self, key):
+        # The fast path timed out: take the normal commit phase instead
+        with self.lock:
+            instance = self.instances.get(key)
+            if instance is None or instance.committed or instance.abandoned:
+                return
+            instance.fast_expired = True
+        self._progress(key)
+
+    def _store(self, instance, message):
+        phase = message['phase']
+        if instance.committed:
+            # Late votes are not verified and change nothing, except that a
+            # replica on the fast path still answers the first commit it sees
+            if phase != 'commit' or not instance.fast or instance.sent_commit:
+                return
+        if phase == 'pre-prepare':
+            start = time.perf_counter()
+            if instance.pre_prepare is not None or not self._accept_pre_prepare(message):
+                return
+            instance.accepted_at = time.perf_counter()
+            if message['sender'] != self.name:  # The primary timed building it in on_request
+                PHASE_SECONDS.observe(instance.accepted_at - start, phase="pre-prepare")
+            instance.pre_prepare = message
+            instance.payload = batch_message(message['records'])
+        elif phase == 'prepare':
+            instance.prepares.setdefault(message['sender'], message)
+        else:
+            instance.commits.setdefault(message['sender'], message)
+        self.node.message_log.append(message)
+
+    def _accept_pre_prepare(self, message):
+        sender = message['sender']
+        if sender != self.primary() or message['view'] != self.node.view_number:
+            return False
+        if not self.window.accept(message['sequence']):
+            return False
+        payload = batch_message(message['records'])
+        if message['digest'] != digest_of(payload):
+            return False
+        return sender == self.name or self.node.verify(payload, message['signature'], sender)
+
+    def _verified(self, instance, phase, messages, signed_text):
+        # Check each vote at most once, dropping the ones that don't verify
+        valid = []
+        for sender, message in list(messages.items()):
+            if (phase, sender) not in instance.verified:
+                if (message['digest'] != instance.pre_prepare['digest']
+                        or not self.node.verify(signed_text, message['signature'], sender)):
+                    del messages[sender]
+                    continue
+                instance.verified.add((phase, sender))
+            valid.append(sender)
+        return valid
+
+    def _commit(self, key, instance):
+        """This replica's commit for the instance"""
+        view, sequence = key
+        commit = {
+            'sequence': sequence,
+            'view': view,
+            'phase': 'commit',
+            'digest': instance.pre_prepare['digest'],
+            'signature': self.node.sign(f"commit:{sequence}:{instance.payload}"),
+            'sender': self.name
+        }
+        instance.commits[self.name] = commit
+        instance.verified.add(('commit', self.name))
+        instance.sent_commit = True
+        self.node.commit_messages[(sequence, view)] = commit
+        return commit
+
+    def _advance(self, key, instance):
+        """Move the instance forward; returns messages to broadcast, if any"""
+        if instance.pre_prepare is None:
+            return None
+        if instance.committed:
+            # A replica that fell back still needs 2f+1 commits, so one that
+            # committed on the fast path answers its commit with its own
+            if instance.fast and instance.commits and not instance.sent_commit:
+                return [self._commit(key, instance)]
+            return None
+        view, sequence = key
+        payload = instance.payload
+        digest = instance.pre_prepare['digest']
+        primary = instance.pre_prepare['sender']
+        outgoing = []
+
+        if self.name != primary and not instance.sent_prepare:
+            prepare = {
+                'sequence': sequence,
+                'view': view,
+                'phase': 'prepare',
+                'digest': digest,
+                'signature': self.node.sign(f"{sequence}:{view}:{payload}"),
+                'sender': self.name
+            }
+            instance.prepares[self.name] = prepare
+            instance.verified.add(('prepare', self.name))
+            instance.sent_prepare = True
+            self.node.prepare_messages[(sequence, view)] = prepare
+            outgoing.append(prepare)
+
+        # Prepared: the pre-prepare plus 2f matching prepares from backups
+        instance.prepares.pop(primary, None)
+        prepared = self._verified(instance, 'prepare', instance.prepares, f"{sequence}:{view}:{payload}")
+        if len(prepared) >= REQUIRED_APPROVALS - 1 and not instance.sent_commit:
+            if FAST_PATH and len(prepared) == len(NODES) - 1:
+                # Fast path: every backup prepared too, so all 3f+1 replicas
+                # agree and the instance commits without a commit round
+                if instance.fallback is not None:
+                    instance.fallback.cancel()
+                instance.committed = instance.fast = True
+                PHASE_SECONDS.observe(time.perf_counter() - instance.accepted_at, phase="prepare")
+                committed = []
+                if instance.commits:  # Someone already fell back
+                    outgoing.append(self._commit(key, instance))
+                    committed = self._verified(instance, 'commit', instance.commits, f"commit:{sequence}:{payload}")
+                self._certify(instance, prepared, committed)
+                return outgoing
+            if not FAST_PATH or instance.fast_expired:
+                outgoing.append(self._commit(key, instance))
+                instance.prepared_at = time.perf_counter()
+                PHASE_SECONDS.observe(instance.prepared_at - instance.accepted_at, phase="prepare")
+            elif instance.fallback is None:
+                # Give the remaining prepares a moment before falling back
+                instance.fallback = threading.Timer(FAST_PATH_TIMEOUT, self._fall_back, (key,))
+                instance.fallback.daemon = True
+                instance.fallback.start()
+
+        # Committed locally: prepared plus 2f+1 matching commits
+        if instance.sent_commit:
+            committed = self._verified(instance, 'commit', instance.commits, f"commit:{sequence}:{payload}")
+            instance.committed = len(committed) >= REQUIRED_APPROVALS
+            if instance.committed:
+                PHASE_SECONDS.observe(time.perf_counter() - instance.prepared_at, phase="commit")
+                self._certify(instance, prepared, committed)
+        return outgoing
+
+    def _certify(self, instance, prepared, committed):
+        # _apply runs outside the lock, so it works from these copies while
+        # other workers keep handling messages for the instance
+        instance.certified_prepares = {sender: instance.prepares[sender] for sender in prepared}
+        instance.certified_commits = {sender: instance.commits[sender] for sender in committed}
+
+    def _apply(self, key, instance):
+        view, sequence = key
+        pre_prepare = instance.pre_prepare
+        records = pre_prepare['records']
+        # The commit certificate; on the fast path the prepares stand in for it
+        prepares = instance.certified_prepares
+        commits = instance.certified_commits
+        votes = prepares if instance.fast else commits
+        partial_signatures = [
+            {"signature": str(vote['signature']), "signed_by": sender}
+            for sender, vote in votes.items()
+        ]
+        commit_path = "fast" if instance.fast else "normal"
+
+        def apply():
+            # Runs once every lower sequence number has been applied
+            start = time.perf_counter()
+            receipts = []
+            for position, record in enumerate(records):
+                committed_record = {
+                    "record": record,
+                    "signature": str(pre_prepare['signature']),
+                    "status": "committed",
+                    "verified_by": "PBFT",
+                    "sequence": sequence,
+                    "batch_position": position,
+                    "batch_size": len(records),
+                    "view": view,
+                    "timestamp": datetime.datetime.now().isoformat(),
+                    "is_primary": True,
+                    "signed_by": pre_prepare['sender'],
+                    "partial_signatures": partial_signatures,
+                    "commit_path": commit_path
+                }
+                append_start = time.perf_counter()
+                instance.ticket = self.ledger.append(committed_record)
+                DB_SECONDS.observe(time.perf_counter() - append_start, node=self.name, operation="append")
+                self.index.add(committed_record)
+                self.tree.add(committed_record)
+                receipts.append({
+                    "status": "Consensus committed",
+                    "record_status": "committed",
+                    "record": record,
+                    "signature": str(pre_prepare['signature']),
+                    "sequence": sequence,
+                    "batch_position": position,
+                    "batch_size": len(records),
+                    "view": view,
+                    "prepares_count": len(prepares),
+                    "commits_count": len(commits),
+                    "commit_path": commit_path,
+                    "prepares": list(prepares.values()),
+                    "commits": list(commits.values()),
+                    "is_primary": True
+                })
+            instance.receipts = receipts
+            self.commit_paths.inc(path=commit_path)
+            PHASE_SECONDS.observe(time.perf_counter() - start, phase="persist")
+            if self.checkpoints.applied(sequence, records):
+                self.due_checkpoints.append((sequence, self.checkpoints.state_digest, len(self.tree)))
+
+        self.window.complete(sequence, apply)
+        instance.applied.set()
+        self._send_checkpoints()
+
+    # --- Checkpoints ---
+    def _send_checkpoints(self):
+        # Signed outside the window lock, which apply() runs under
+        while self.due_checkpoints:
+            try:
+                sequence, digest, size = self.due_checkpoints.popleft()
+            except IndexError:
+                return
+            self.sign_root(sequence, size)
+            checkpoint = {
+                'sequence': sequence,
+                'phase': 'checkpoint',
+                'digest': digest,
+                'signature': self.node.sign(checkpoint_message(sequence, digest)),
+                'sender': self.name
+            }
+            self.broadcast(checkpoint)
+            self.on_checkpoint(checkpoint)
+
+    def on_checkpoint(self, message):
+        sequence, digest, sender = message['sequence'], message['digest'], message['sender']
+        if sender != self.name and not self.node.verify(
+                checkpoint_message(sequence, digest), message['signature'], sender):
+            return None
+        with self.lock:
+            stable = self.checkpoints.add_vote(sequence, digest, sender, message['signature'])
+            if stable:
+                self._discard_below(sequence)
+        if stable and sequence > self.window.low:
+            # 2f+1 replicas are past a point this replica never reached
+            self.start_catch_up()
+        return None
+
+    def sign_root(self, sequence, size):
+        """Sign the Merkle root over the first size records; queries prove against it"""
+        root = self.tree.root(size)
+        signature = self.harn_keys.sign(self.name, root_message(sequence, size, root))
+        self.signed_root = {"sequence": sequence, "size": size, "root": root, "signature": str(signature)}
+
+    def _discard_below(self, sequence):
+        # Never drop instances this replica has not applied yet
+        limit = min(sequence, self.window.low)
+        self.node.discard_below(limit)
+        self.instances = {key: i for key, i in self.instances.items() if key[1] > limit}
+
+    # --- State transfer ---
+    def on_fetch(self, message):
+        """Serve one chunk of committed records to a lagging replica"""
+        upto = min(message['upto'], self.window.low)
+        records, more = records_between(self.index.records, message['after'], upto, STATE_TRANSFER_CHUNK)
+        return {"records": records, "more": more}
+
+    def start_catch_up(self):
+        with self.lock:
+            if self.catching_up:
+                return
+            self.catching_up = True
+        threading.Thread(target=self._catch_up, name=f"{self.name}-catch-up", daemon=True).start()
+
+    def _catch_up(self):
+        try:
+            while self.catch_up():
+                pass  # The others may have moved on again while we caught up
+        except Exception as e:
+            print(f"Replica {self.name}: state transfer failed: {e}")
+        finally:
+            with self.lock:
+                self.catching_up = False
+
+    def catch_up(self):
+        """Fetch and install the committed records this replica is missing
+        from the peer furthest ahead; returns True if anything was installed"""
+        with self.window.cond:
+            base, digest = self.window.low, self.checkpoints.state_digest
+        peer, status = self._furthest_peer()
+        if peer is None or status["low_watermark"] <= base:
+            return False
+
+        tracker = CheckpointTracker(CHECKPOINT_INTERVAL, REQUIRED_APPROVALS, base, digest)
+        stable = status["stable_checkpoint"]
+        records, reached, full = [], base, False
+        if stable["sequence"] > base and certificate_valid(self.node, stable, REQUIRED_APPROVALS):
+            # Up to the checkpoint: cheap digest check against the certificate
+            records = self._fetch(peer, base, stable["sequence"])
+            for sequence, batch in batches(records):
+                tracker.applied(sequence, [r["record"] for r in batch])
+            if tracker.state_digest != stable["digest"]:
+                # Our own history disagrees with the certified one, so
+                # replace it with the peer's whole snapshot
+                records = self._fetch(peer, 0, stable["sequence"])
+                tracker = CheckpointTracker.from_records(records, CHECKPOINT_INTERVAL, REQUIRED_APPROVALS)
+                if tracker.state_digest != stable["digest"]:
+                    print(f"Replica {self.name}: snapshot from {peer} does not match its checkpoint")
+                    return False
+                full = True
+            reached = stable["sequence"]
+        else:
+            stable = self.checkpoints.stable
+
+        # The log suffix: each batch must carry its own commit certificate
+        for sequence, batch in batches(self._fetch(peer, reached, status["low_watermark"])):
+            if not batch_committed(self.node, sequence, batch, REQUIRED_APPROVALS):
+                print(f"Replica {self.name}: batch {sequence} from {peer} is not committed by a quorum")
+                break
+            tracker.applied(sequence, [r["record"] for r in batch])
+            records.extend(batch)
+            reached = sequence
+        else:
+            reached = status["low_watermark"]
+
+        def install():
+            if full:
+                kept = [r for r in self.index.records if r.get("sequence") is None]
+                self.ledger.replace(kept + records)
+                self.index = self._build_index(kept + records)
+                self.tree = MerkleTree(self.index.records)
+            else:
+                for record in records:
+                    self.ledger.append(record)
+                    self.index.add(record)
+                    self.tree.add(record)
+            self.checkpoints.install(reached, tracker.state_digest, stable)
+
+        with self.lock:
+            installed = self.window.advance(base, reached, install)
+            if installed:
+                self.node.sequence_number = max(self.node.sequence_number, reached)
+                self._discard_below(self.checkpoints.stable["sequence"])
+        if installed:
+            self.sign_root(reached, len(self.tree))
+            print(f"Replica {self.name}: caught up from {base} to {reached} ({len(records)} records from {peer})")
+        return installed
+
+    def _furthest_peer(self):
+        best, best_status = None, None
+        for peer, address in self.peers.items():
+            try:
+                status = request(address, {'phase': 'status'}, REPLICA_TIMEOUT)
+            except (OSError, ValueError):
+                continue  # Down or not started yet
+            if best_status is None or status["low_watermark"] > best_status["low_watermark"]:
+                best, best_status = peer, status
+        return best, best_status
+
+    def _fetch(self, peer, after, upto):
+        """Committed records with after < sequence <= upto, one chunk per request"""
+        records = []
+        while True:
+            reply = request(self.peers[peer], {'phase': 'fetch', 'after': after, 'upto': upto}, REPLICA_TIMEOUT)
+            records.extend(reply["records"])
+            if not reply["more"] or not reply["records"]:
+                return records
+            after = records[-1]["sequence"]
+
+    # --- Reads for the gateway ---
+    def on_query(self, message):
+        if 'after' in message:
+            # One page of (ledger position, record) pairs for the gateway
+            page = list(islice(self.index.scan(message.get('item_id'), message['after']), message['limit'] + 1))
+            return {"page": page[:message['limit']], "more": len(page) > message['limit']}
+        records = list(self.index.lookup(message.get('item_id')))
+        if not message.get('proofs'):
+            return {"records": records}
+        signed_root = self.signed_root
+        return {"records": records, "proofs": self.tree.proofs(records, signed_root["size"]), "signed_root": signed_root}
+
+    def on_status(self, message):
+        return {
+            "name": self.name,
+            "view": self.node.view_number,
+            "seq": self.node.sequence_number,
+            "primary": self.primary(),
+            "low_watermark": self.window.low,
+            "high_watermark": self.window.high,
+            "records_stored": len(self.index),
+            "message_log": len(self.node.message_log),
+            "instances": len(self.instances),
+            "stable_checkpoint": self.checkpoints.stable
+        }
+
+    def on_metrics(self, message):
+        return {"metrics": REGISTRY.snapshot()}
+
+
+def run_replica(name):
+    Replica(name).serve()
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(NODES.keys())
+    if len(names) == 1:
+        run_replica(names[0])
+    else:
+        processes = [multiprocessing.Process(target=run_replica, args=(name,), name=f"replica-{name}")
+                     for name in names]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
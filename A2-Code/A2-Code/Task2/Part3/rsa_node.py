@@ -0,0 +1,71 @@
+"""RSA keys and PBFT message state for a single node.
+
+Kept separate from app.py so stand-alone replica processes can use it.
+Public keys of other nodes are looked up in config.NODES.
+"""
+import hashlib
+import time
+from config import NODES, RSA_CRT_CHECK
+from metrics import SIGN_SECONDS, VERIFY_SECONDS
+
+
+def crt_pow(m, p, q, dp, dq, qinv):
+    """m^d mod pq via the Chinese Remainder Theorem (dp = d mod p-1, dq = d mod q-1)"""
+    m1 = pow(m, dp, p)
+    m2 = pow(m, dq, q)
+    return m2 + ((qinv * (m1 - m2)) % p) * q
+
+
+def _sequence_of(message):
+    # app.py logs message objects, replica.py the dicts it receives
+    return message.get('sequence', 0) if isinstance(message, dict) else message.sequence
+
+
+# --- RSANode Class Definition ---
+class RSANode:
+    def __init__(self, name, p, q, e):
+        self.name = name
+        self.p = p
+        self.q = q
+        self.e = e
+        self.n = p * q
+        self.phi = (p - 1) * (q - 1)
+        self.d = pow(e, -1, self.phi)
+        # CRT parameters, computed once, so signing works mod p and q separately
+        self.dp = self.d % (p - 1)
+        self.dq = self.d % (q - 1)
+        self.qinv = pow(q, -1, p)
+        self.view_number = 0
+        self.sequence_number = 0
+        self.prepare_messages = {}
+        self.commit_messages = {}
+        self.message_log = []
+
+    def discard_below(self, sequence):
+        """Drop logged messages at or below a stable checkpoint"""
+        self.message_log = [m for m in self.message_log if _sequence_of(m) > sequence]
+        self.prepare_messages = {k: m for k, m in self.prepare_messages.items() if k[0] > sequence}
+        self.commit_messages = {k: m for k, m in self.commit_messages.items() if k[0] > sequence}
+
+    def sign(self, message):
+        start = time.perf_counter()
+        message_bytes = message.encode()
+        h = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
+        if h >= self.n:
+            h = h % self.n
+        signature = crt_pow(h, self.p, self.q, self.dp, self.dq, self.qinv)
+        if RSA_CRT_CHECK and signature != pow(h, self.d, self.n):
+            raise ValueError(f"CRT signature mismatch for node {self.name}")
+        SIGN_SECONDS.observe(time.perf_counter() - start, node=self.name)
+        return signature
+
+    def verify(self, message, signature, signer_name):
+        start = time.perf_counter()
+        signer = NODES[signer_name]
+        signer_e, signer_n = signer.e, signer.n
+        message_bytes = message.encode()
+        h_original = int.from_bytes(hashlib.sha256(message_bytes).digest(), 'big')
+        sig_int = int(signature) if isinstance(signature, str) else signature
+        h_recovered = pow(sig_int, signer_e, signer_n)
+        VERIFY_SECONDS.observe(time.perf_counter() - start, node=self.name)
+        return h_original == h_recovered
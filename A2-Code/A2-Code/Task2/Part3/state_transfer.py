@@ -0,0 +1,81 @@
+"""State transfer for replicas that fell behind (restarted, partitioned, ...).
+
+A lagging replica fetches the committed records it is missing from a peer,
+in chunks of whole batches starting after its own last applied sequence.
+Records up to the peer's stable checkpoint are checked by folding them into
+the replica's own state digest, which must reproduce the digest that 2f+1
+replicas signed in the checkpoint certificate. Records past the checkpoint
+(the log suffix) are not covered by a certificate yet, so each of those
+batches is checked against the 2f+1 commit signatures stored with it, or,
+for a batch that took the fast path, against the primary's pre-prepare and
+the prepares of all the other replicas.
+"""
+from bisect import bisect_right
+from itertools import groupby, islice
+from config import NODES
+from batching import batch_message
+from checkpoint import checkpoint_message
+
+
+def sequence_of(record):
+    return record.get("sequence") or 0
+
+
+def records_between(records, after, upto, limit):
+    """One chunk of a sequence-ordered record list: whole batches with
+    after < sequence <= upto, at least limit records unless the range runs
+    out first. Returns (chunk, more)."""
+    chunk = []
+    for record in islice(records, bisect_right(records, after, key=sequence_of), None):
+        sequence = sequence_of(record)
+        if sequence > upto:
+            break
+        if len(chunk) >= limit and sequence != sequence_of(chunk[-1]):
+            return chunk, True
+        chunk.append(record)
+    return chunk, False
+
+
+def batches(records):
+    """Group sequence-ordered records into (sequence, [records]) batches"""
+    return [(sequence, list(batch)) for sequence, batch in groupby(records, key=sequence_of)]
+
+
+def _signers(node, message, votes, sender_key):
+    signers = set()
+    for vote in votes:
+        sender = vote.get(sender_key)
+        if sender in NODES and sender not in signers and node.verify(message, vote["signature"], sender):
+            signers.add(sender)
+    return signers
+
+
+def certificate_valid(node, stable, quorum):
+    """True if 2f+1 distinct replicas signed the stable checkpoint"""
+    message = checkpoint_message(stable["sequence"], stable["digest"])
+    return len(_signers(node, message, stable.get("proof") or [], "sender")) >= quorum
+
+
+def certificate_message(sequence, first, payload):
+    """The text a batch's partial_signatures sign: the prepare for a fast-path
+    commit, otherwise the commit"""
+    if first.get("commit_path") == "fast":
+        return f"{sequence}:{first.get('view')}:{payload}"
+    return f"commit:{sequence}:{payload}"
+
+
+def batch_committed(node, sequence, batch, quorum):
+    """True if a fetched batch is complete and carries 2f+1 valid commit
+    signatures, or a valid fast-path certificate"""
+    first = batch[0]
+    if [r.get("batch_position") for r in batch] != list(range(first.get("batch_size") or 0)):
+        return False
+    payload = batch_message([r["record"] for r in batch])
+    votes = first.get("partial_signatures") or []
+    signers = _signers(node, certificate_message(sequence, first, payload), votes, "signed_by")
+    if first.get("commit_path") == "fast":
+        # Every replica agreed: the primary's pre-prepare plus a prepare from each backup
+        primary = first.get("signed_by")
+        return primary in NODES and node.verify(payload, first.get("signature"), primary) \
+            and len(signers - {primary}) == len(NODES) - 1
+    return len(signers) >= quorum
@@ -0,0 +1,39 @@
+"""Request batching tests: python -m pytest Task2/Part3 from the A2-Code folder"""
+import threading
+import time
+from batching import RequestBatcher
+
+
+def test_lone_submit_is_not_held():
+    batcher = RequestBatcher(lambda node, records: list(records), max_size=32, max_wait=1.0)
+    start = time.perf_counter()
+    assert batcher.submit("A", "A:1:1:1") == "A:1:1:1"
+    assert time.perf_counter() - start < 0.5
+
+
+def test_submits_gather_while_a_batch_is_in_flight():
+    release = threading.Event()
+    batches = []
+
+    def process(node, records):
+        batches.append(list(records))
+        if len(batches) == 1:
+            release.wait(5)  # Keep the first batch in flight
+        return list(records)
+
+    # A full batch is sealed straight away, so max_wait never runs out here
+    batcher = RequestBatcher(process, max_size=5, max_wait=5)
+    first = threading.Thread(target=batcher.submit, args=("A", "first"))
+    first.start()
+    while not batches:
+        time.sleep(0.001)
+    others = [threading.Thread(target=batcher.submit, args=("A", f"r{i}")) for i in range(5)]
+    for thread in others:
+        thread.start()
+    while len(batches) < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in [first] + others:
+        thread.join(5)
+    assert batches[0] == ["first"]
+    assert sorted(batches[1]) == [f"r{i}" for i in range(5)]
@@ -0,0 +1,47 @@
+"""Merkle proof tests: python -m pytest Task2/Part3 from the A2-Code folder"""
+from config import NODES, PKG
+from harn_keys import HarnKeyStore
+from merkle import MerkleTree, leaf_text, root_message, verify_proof
+
+
+def committed(count):
+    return [{"record": f"A:{i:05d}:1:{i}", "sequence": i // 2 + 1, "batch_position": i % 2}
+            for i in range(count)]
+
+
+def test_every_proof_verifies():
+    records = committed(11)
+    tree = MerkleTree(records)
+    for size in (1, 6, 11):
+        root = tree.root(size)
+        for proof in tree.proofs(records[:size], size):
+            assert verify_proof(proof["leaf"], proof["path"], root)
+
+
+def test_tampered_record_fails():
+    records = committed(11)
+    tree = MerkleTree(records)
+    proof = tree.proofs([records[5]], len(tree))[0]
+    forged = dict(records[5], record="A:00005:1000:5")
+    assert not verify_proof(leaf_text(forged), proof["path"], tree.root())
+
+
+def test_tampered_path_fails():
+    records = committed(11)
+    tree = MerkleTree(records)
+    proof = tree.proofs([records[5]], len(tree))[0]
+    side, sibling = proof["path"][0]
+    flipped = [["R" if side == "L" else "L", sibling]] + proof["path"][1:]
+    altered = [[side, sibling[:-1] + ("0" if sibling[-1] != "0" else "1")]] + proof["path"][1:]
+    assert not verify_proof(proof["leaf"], flipped, tree.root())
+    assert not verify_proof(proof["leaf"], altered, tree.root())
+    assert not verify_proof(proof["leaf"], proof["path"][1:], tree.root())
+
+
+def test_signed_root_verifies_only_for_its_signer():
+    keys = HarnKeyStore(PKG, NODES)
+    message = root_message(4, 8, MerkleTree(committed(8)).root())
+    signature = keys.sign("A", message)
+    assert keys.verify("A", message, signature)
+    assert not keys.verify("B", message, signature)
+    assert not keys.verify("A", root_message(4, 8, "00" * 32), signature)
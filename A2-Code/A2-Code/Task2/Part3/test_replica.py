@@ -0,0 +1,49 @@
+"""Replica tests: python -m pytest Task2/Part3 from the A2-Code folder"""
+import threading
+import replica
+from batching import batch_message
+from config import NODES, PIPELINE_WINDOW
+from pipeline import SequenceWindow
+from rsa_node import RSANode
+
+
+def submit(node, records, timeout=5):
+    # Run on_request in a thread, so a window that never frees a slot fails
+    # the test instead of hanging it
+    replies = []
+    thread = threading.Thread(target=lambda: replies.append(node.on_request({"phase": "request", "records": records})),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert replies, "on_request blocked waiting for a free sequence slot"
+    return replies[0]
+
+
+def test_timed_out_instance_frees_its_slot(tmp_path, monkeypatch):
+    monkeypatch.setattr(replica, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(replica, "REPLICA_TIMEOUT", 0.01)
+    primary = replica.Replica("A")  # Its peers are not running, so nothing commits
+
+    for i in range(PIPELINE_WINDOW + 1):
+        assert "error" in submit(primary, [f"A:{i}:1:1"])
+        assert primary.window.in_flight() == 0
+
+    # A quorum that turns up after the timeout must not apply it out of order
+    instance = primary.instances[(0, 1)]
+    payload = batch_message(["A:0:1:1"])
+    for name in ("B", "C"):
+        backup = RSANode(name, NODES[name].p, NODES[name].q, NODES[name].e)
+        for phase, text in (("prepare", f"1:0:{payload}"), ("commit", f"commit:1:{payload}")):
+            primary.on_protocol_message({"sequence": 1, "view": 0, "phase": phase, "sender": name,
+                                         "digest": instance.pre_prepare["digest"], "signature": backup.sign(text)})
+    assert instance.committed and instance.abandoned
+    assert not instance.applied.is_set() and primary.ledger.count == 0
+
+
+def test_abort_waits_for_lower_sequences():
+    window = SequenceWindow(4)
+    first, second = window.acquire(), window.acquire()
+    window.abort(second)  # Returns at once although first is still in flight
+    assert window.low == 0 and window.in_flight() == 2
+    window.complete(first)
+    assert window.low == second and window.in_flight() == 0
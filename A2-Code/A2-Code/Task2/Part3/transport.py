@@ -0,0 +1,61 @@
+"""Wire format for replica messages and the gateway's client side.
+
+Every message is one frame: a 4-byte big-endian length, then that many
+bytes of JSON. Frames over MAX_MESSAGE_BYTES are refused on both ends with
+an error rather than cut short. Replicas talk to each other over
+message_bus.py; the gateway uses request() to send a client request or query
+and wait for the replica's reply on the same connection.
+"""
+import json
+import socket
+import struct
+
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024  # Far above a full batch or state-transfer chunk
+
+
+def encode(message):
+    body = json.dumps(message, separators=(",", ":")).encode('utf-8')
+    if len(body) > MAX_MESSAGE_BYTES:
+        raise ValueError(f"{message.get('phase')} message of {len(body)} bytes exceeds {MAX_MESSAGE_BYTES}")
+    return HEADER.pack(len(body)) + body
+
+
+def frame_length(header):
+    """Body length from a frame header, checked against MAX_MESSAGE_BYTES"""
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Incoming message of {length} bytes exceeds {MAX_MESSAGE_BYTES}")
+    return length
+
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        raise ConnectionError("Connection closed in the middle of a message")
+    return data
+
+
+def request(address, message, timeout):
+    """Send a message and wait for the one-frame reply"""
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall(encode(message))
+        f = sock.makefile('rb')
+        header = f.read(HEADER.size)
+        if not header:
+            raise ConnectionError(f"No reply from replica at {address[0]}:{address[1]}")
+        if len(header) < HEADER.size:
+            raise ConnectionError("Connection closed in the middle of a message")
+        body = _read_exactly(f, frame_length(header))
+    return json.loads(body)
+
+
+class ReplicaClient:
+    """Used by app.py in multi-process mode to talk to the replicas"""
+
+    def __init__(self, host, ports, timeout):
+        self.addresses = {name: (host, port) for name, port in ports.items()}
+        self.timeout = timeout
+
+    def call(self, node, message, timeout=None):
+        return request(self.addresses[node], message, timeout or self.timeout)
@@ -0,0 +1,12 @@
+"""End-to-end benchmarks for the three PBFT apps.
+
+Run from the A2-Code folder (the one holding Task1/ and Task2/):
+
+    python -m benchmarks                          # all apps, Flask test client
+    python -m benchmarks --apps Task2/Part3 --sizes 0,1000 --output run.json
+    python -m benchmarks --apps Task2/Part3 --http http://127.0.0.1:5000
+
+Each app is benchmarked in its own subprocess against a temporary copy of
+its folder, so the real database/ files are never touched. Results are
+written as JSON (see benchmarks/apps.py for the layout).
+"""
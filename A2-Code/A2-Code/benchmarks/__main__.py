@@ -0,0 +1,62 @@
+"""python -m benchmarks: run every app's benchmark and emit one JSON report"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from benchmarks.apps import ROOT, WORKLOADS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--apps", default=",".join(sorted(WORKLOADS)),
+                        help="Comma-separated app folders, e.g. Task2/Part3")
+    parser.add_argument("--sizes", default="0,1000,10000,100000",
+                        help="Ledger sizes (records per node) to measure at")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint per ledger size")
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads per endpoint")
+    parser.add_argument("--http", help="Base URL of a running app (needs exactly one --apps)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    parts = [part for part in args.apps.split(",") if part]
+    unknown = [part for part in parts if part not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unknown app(s): {', '.join(unknown)}")
+    if args.http and len(parts) != 1:
+        parser.error("--http needs exactly one app")
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for part in parts:
+            out = os.path.join(tmp, part.replace("/", "_") + ".json")
+            command = [sys.executable, "-m", "benchmarks.apps", "--part", part, "--out", out,
+                       "--sizes", args.sizes, "--requests", str(args.requests),
+                       "--concurrency", str(args.concurrency)]
+            if args.http:
+                command += ["--http", args.http]
+            print(f"Benchmarking {part} ...", file=sys.stderr)
+            subprocess.run(command, cwd=ROOT, check=True)
+            with open(out) as f:
+                reports.append(json.load(f))
+
+    report = json.dumps({
+        "generated_at": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"sizes": args.sizes, "requests": args.requests,
+                   "concurrency": args.concurrency},
+        "apps": reports,
+    }, indent=1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Per-app workloads and the single-app benchmark run.
+
+python -m benchmarks starts this module once per app in a fresh process
+(the apps all import modules called config, ledger, ...). Output layout:
+
+    {"app": "Task2/Part3", "mode": "test_client", "concurrency": 4,
+     "results": [{"ledger_size": 1000,
+                  "endpoints": {"/submit": {"requests", "errors", "throughput_rps",
+                                            "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}, ...},
+                  "phases": {"pre_prepare": {...}, "prepare": {...},
+                             "commit": {...}, "persist": {...}}}, ...]}
+
+"phases" is what the app's own /metrics recorded for the /submit requests
+of that step (its pbft_phase_duration_seconds histograms, scraped before and
+after), so it is the cost of each phase as the app really runs it. It is
+null for an app without /metrics.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+from benchmarks.harness import HttpDriver, TestClientDriver, drive, read_histogram, summarize_histogram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODE_NAMES = ['A', 'B', 'C', 'D']
+ITEMS = 10000  # Distinct item ids, so a query hits ledger_size / ITEMS records per node
+FAKE_SIGNATURE = "9" * 90  # Prefilled records are never verified
+PHASE_HISTOGRAM = "pbft_phase_duration_seconds"
+PHASES = ("pre-prepare", "prepare", "commit", "persist")
+
+
+def node_for(i):
+    return NODE_NAMES[i % len(NODE_NAMES)]
+
+
+def item_for(i):
+    return f"{i % ITEMS:05d}"
+
+
+def record_for(i):
+    return f"{node_for(i)}:{item_for(i)}:1:1"
+
+
+# Requests for each endpoint: make_request(i) -> (method, path, json body)
+WORKLOADS = {
+    "Task1/Part1": {
+        "/submit": lambda i: ("POST", "/submit", {"node": node_for(i), "item": item_for(i), "quantity": 1, "price": 1}),
+        "/search_record": lambda i: ("GET", f"/search_record?record_number={item_for(i)}", None),
+        "/status": lambda i: ("GET", f"/status?sequence={i + 1}&node={node_for(i)}", None),
+    },
+    "Task1/Part2": {
+        "/submit": lambda i: ("POST", "/submit", {"node": node_for(i), "record": record_for(i)}),
+        "/api/query": lambda i: ("POST", "/api/query", {"node": node_for(i), "item_id": item_for(i)}),
+    },
+    "Task2/Part3": {
+        "/submit": lambda i: ("POST", "/submit", {"node": node_for(i), "record": record_for(i)}),
+        "/api/query": lambda i: ("POST", "/api/query", {"node": node_for(i), "item_id": item_for(i)}),
+        "/api/verify-query": lambda i: ("POST", "/api/verify-query", {"item_id": item_for(i)}),
+        "/status": lambda i: ("GET", "/status", None),
+    },
+}
+
+
+def synthetic_record(part, i):
+    """A committed record in the layout each app writes to its ledger"""
+    if part == "Task1/Part1":
+        return {"record": record_for(i), "signature": FAKE_SIGNATURE, "verified_by": "B"}
+    record = {
+        "record": record_for(i),
+        "signature": FAKE_SIGNATURE,
+        "status": "committed",
+        "verified_by": "PBFT",
+        "sequence": i + 1,
+        "view": 0,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "is_primary": True,
+    }
+    if part == "Task2/Part3":
+        record.update({
+            "batch_position": 0,
+            "batch_size": 1,
+            "signed_by": "A",
+            "partial_signatures": [{"signature": FAKE_SIGNATURE, "signed_by": name} for name in NODE_NAMES],
+        })
+    return record
+
+
+def scrape_phases(driver):
+    """The app's per-phase histograms from /metrics, or None without one"""
+    text = driver.text("/metrics")
+    return None if text is None else read_histogram(text, PHASE_HISTOGRAM, "phase")
+
+
+def phase_summary(before, after):
+    """Per-phase cost of the instances run between two scrape_phases()"""
+    if before is None or after is None:
+        return None
+    return {phase.replace("-", "_"): summarize_histogram(before.get(phase), after[phase])
+            for phase in PHASES if phase in after}
+
+
+def run_endpoints(driver, part, requests, concurrency):
+    """Drive every endpoint of the app; returns (endpoints, phases)"""
+    before = scrape_phases(driver)
+    endpoints = {path: drive(driver, make_request, requests, concurrency)
+                 for path, make_request in WORKLOADS[part].items()}
+    return endpoints, phase_summary(before, scrape_phases(driver))
+
+
+def load_app(part, workdir):
+    """Import a copy of the app whose database/ starts out empty"""
+    app_dir = os.path.join(workdir, part)
+    shutil.copytree(os.path.join(ROOT, part), app_dir,
+                    ignore=shutil.ignore_patterns("database", "__pycache__"))
+    os.makedirs(os.path.join(app_dir, "database"))
+    os.chdir(workdir)
+    sys.path.insert(0, app_dir)
+    import app as app_module
+    return app_module
+
+
+def run_test_client(part, sizes, requests, concurrency):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+        # The apps print every signature and verification; keep that out of the report
+        with contextlib.redirect_stdout(devnull):
+            app_module = load_app(part, workdir)
+            driver = TestClientDriver(app_module.app)
+            filled = 0
+            for size in sorted(sizes):
+                for i in range(filled, size):
+                    record = synthetic_record(part, i)
+                    for name in NODE_NAMES:
+                        app_module.append_db(name, record)
+                filled = max(filled, size)
+
+                endpoints, phases = run_endpoints(driver, part, requests, concurrency)
+                results.append({"ledger_size": size, "endpoints": endpoints, "phases": phases})
+    return results
+
+
+def run_http(part, base_url, requests, concurrency):
+    driver = HttpDriver(base_url)
+    endpoints, phases = run_endpoints(driver, part, requests, concurrency)
+    return [{"ledger_size": None, "endpoints": endpoints, "phases": phases}]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark one app (normally run via python -m benchmarks)")
+    parser.add_argument("--part", required=True, choices=sorted(WORKLOADS))
+    parser.add_argument("--sizes", default="0,1000,10000,100000")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--http", help="Base URL of a running app instead of the Flask test client")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    if args.http:
+        results = run_http(args.part, args.http, args.requests, args.concurrency)
+    else:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        results = run_test_client(args.part, sizes, args.requests, args.concurrency)
+
+    with open(args.out, 'w') as f:
+        json.dump({
+            "app": args.part,
+            "mode": "http" if args.http else "test_client",
+            "concurrency": args.concurrency,
+            "results": results,
+        }, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
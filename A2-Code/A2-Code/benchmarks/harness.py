@@ -0,0 +1,172 @@
+"""Timing helpers and request drivers shared by the benchmarks"""
+import json
+import math
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def summarize(samples, wall_time=None):
+    """Latency percentiles (ms) for durations in seconds, plus throughput"""
+    if not samples:
+        return {"requests": 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        rank = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[rank] * 1000
+
+    summary = {
+        "requests": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+    if wall_time:
+        summary["throughput_rps"] = len(ordered) / wall_time
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in summary.items()}
+
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def read_histogram(text, name, label):
+    """{label value: ({le: cumulative count}, sum, count)} for histogram name
+    in a Prometheus text scrape, added up over any other labels (such as the
+    replica label of a multi-process gateway)"""
+    histogram = {}
+    for line in (text or "").splitlines():
+        match = SAMPLE.match(line)
+        if not match or not match.group(1).startswith(name + "_"):
+            continue
+        suffix = match.group(1)[len(name):]
+        labels = dict(LABEL.findall(match.group(2) or ""))
+        if label not in labels:
+            continue
+        buckets, total, count = histogram.get(labels[label], ({}, 0.0, 0))
+        value = float(match.group(3))
+        if suffix == "_bucket":
+            le = float(labels["le"])
+            buckets[le] = buckets.get(le, 0) + value
+        elif suffix == "_sum":
+            total += value
+        elif suffix == "_count":
+            count += value
+        histogram[labels[label]] = (buckets, total, count)
+    return histogram
+
+
+def summarize_histogram(before, after):
+    """Latency summary (ms) of the observations a histogram gained between
+    two read_histogram() entries; percentiles are interpolated within
+    buckets, as Prometheus' histogram_quantile() does"""
+    buckets_before, total_before, count_before = before or ({}, 0.0, 0)
+    buckets_after, total_after, count_after = after
+    count = int(count_after - count_before)
+    if count <= 0:
+        return {"requests": 0}
+    bounds = sorted(buckets_after)
+    cumulative = [buckets_after[le] - buckets_before.get(le, 0) for le in bounds]
+
+    def percentile(p):
+        rank = p / 100 * count
+        lower, below = 0.0, 0
+        for le, seen in zip(bounds, cumulative):
+            if seen >= rank:
+                if le == math.inf:
+                    return lower * 1000  # Past the last finite bucket
+                return (lower + (le - lower) * (rank - below) / max(seen - below, 1)) * 1000
+            lower, below = le, seen
+        return lower * 1000
+
+    summary = {
+        "requests": count,
+        "mean_ms": (total_after - total_before) / count * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in summary.items()}
+
+
+class TestClientDriver:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    def request(self, method, path, body=None):
+        response = self.flask_app.test_client().open(path, method=method, json=body)
+        return response.status_code
+
+    def text(self, path):
+        """Body of a GET, or None unless it answers 200"""
+        response = self.flask_app.test_client().get(path)
+        return response.get_data(as_text=True) if response.status_code == 200 else None
+
+
+class HttpDriver:
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return None
+
+    def text(self, path):
+        """Body of a GET, or None unless it answers 200"""
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+                return response.read().decode()
+        except OSError:
+            return None
+
+
+def drive(driver, make_request, count, concurrency=1):
+    """Send count requests from concurrency threads; make_request(i) gives
+    (method, path, body). 4xx answers (e.g. 404 for a missing item) are
+    valid responses; only 5xx and transport failures count as errors."""
+    samples = []
+    errors = 0
+    next_index = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal next_index, errors
+        while True:
+            with lock:
+                i = next_index
+                next_index += 1
+            if i >= count:
+                return
+            method, path, body = make_request(i)
+            start = time.perf_counter()
+            status = driver.request(method, path, body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                if status is None or status >= 500:
+                    errors += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = summarize(samples, time.perf_counter() - start)
+    summary["errors"] = errors
+    return summary
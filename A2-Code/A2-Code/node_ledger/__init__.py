@@ -0,0 +1,12 @@
+"""Node ledger storage shared by the three PBFT apps.
+
+ledger.py holds the append-only binary segments (NodeLedger) and the
+durability modes, storage.py the SQLite backend and open_ledger(). Each
+app's own storage.py re-exports what the app uses.
+
+Convert a database folder between node_x.json and the ledgers, from the
+A2-Code folder (the one holding Task1/ and Task2/):
+
+    python -m node_ledger export Task2/Part3/database
+    python -m node_ledger import --backend sqlite Task1/Part2/database A B
+"""
@@ -0,0 +1,40 @@
+"""python -m node_ledger: convert node ledgers to and from node_x.json
+
+    python -m node_ledger [export | import] [--backend segment|sqlite] <database dir> [node ...]
+
+export (the default) writes each node's ledger back to node_x.json;
+import rebuilds each node's ledger from its node_x.json. The backend
+defaults to STORAGE_BACKEND, as for the running apps.
+"""
+import os
+import sys
+from node_ledger.ledger import STRICT
+from node_ledger.storage import open_ledger
+
+BACKENDS = ("segment", "sqlite")
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    command = args.pop(0) if args and args[0] in ("export", "import") else "export"
+    backend = os.environ.get("STORAGE_BACKEND", "segment")
+    if args and args[0] == "--backend":
+        if len(args) < 2 or args[1] not in BACKENDS:
+            sys.exit("--backend takes segment or sqlite")
+        backend = args[1]
+        del args[:2]
+    if not args:
+        sys.exit(__doc__)
+    db_dir = args[0]
+    for node in args[1:] or ['A', 'B', 'C', 'D']:
+        ledger = open_ledger(node, db_dir, backend, durability=STRICT)
+        if command == "import":
+            ledger.replace(ledger._load_json_records())
+            print(f"Node {node}: {ledger.json_path} -> {ledger.count} records in {ledger.path}")
+        else:
+            print(f"Node {node}: {ledger.count} records -> {ledger.export_json()}")
+        ledger.close()
+
+
+if __name__ == '__main__':
+    main()
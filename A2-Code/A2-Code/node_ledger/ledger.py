@@ -0,0 +1,493 @@
+"""Append-only binary ledger segments backing each node's database.
+
+Every committed record is appended to ``node_x.ledger`` as one binary frame,
+so a commit costs one append however large the ledger grows. Signatures
+(decimal strings of RSA/Harn integers) are stored as fixed-width big-endian
+integers instead of text. ``node_x.offsets`` is the offset table: the 8-byte
+big-endian position of every frame. Readers mmap the segment and decode only
+the records they touch.
+
+    segment  b"LDGB", u16 signature width W, then frames
+    frame    u32 body length, then the body:
+               u8 flags: 1 = signature, 2 = partial signatures, 4 = record text
+               [W-byte signature]
+               [u16 count, then per partial signature: W-byte signature,
+                u8 length + signed_by]
+               [u32 length + record text]
+               the remaining fields as compact JSON in the record's key
+               order, with the fields stored above left as null
+
+Anything that does not fit (a signature that is not a canonical decimal of at
+most W bytes, unusual partial signature entries) simply stays in the JSON.
+The old ``node_x.json`` layout ({"records": [...]}) and the earlier
+JSON-frame segments are migrated on first open; ``python -m node_ledger``
+converts between node_x.json and the configured storage backend.
+
+A per-ledger lock serialises appends and rewrites, so request threads can
+share one ledger; a ledger directory belongs to a single process.
+
+Durability modes decide when an appended record is on stable storage:
+
+    strict   every append is fsynced before it returns
+    group    the first commit to wait for durability fsyncs at once; commits
+             that wait while that fsync runs share the next one, which
+             covers every record appended before it. A background thread
+             syncs records nobody waits for once group_size are pending or
+             the oldest has waited group_interval seconds
+    relaxed  records stay in the OS page cache until the kernel writes them
+
+append() returns a ticket, and wait_durable(ticket) blocks until that record
+is durable. That is the commit's acknowledgement. Only the segment is synced:
+recovery rebuilds offset table entries that never reached the disk.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+
+MAGIC = b"LDGB"
+HEADER = struct.Struct(">4sH")  # Magic, signature width
+U32 = struct.Struct(">I")
+U16 = struct.Struct(">H")
+OFFSET = struct.Struct(">Q")
+SIGNATURE_BYTES = 40  # Fits the 300-bit RSA and Harn moduli with room to spare
+TAIL_SIZE = 64  # Most recent records kept in memory per node
+
+HAS_SIGNATURE, HAS_PARTIALS, HAS_TEXT = 1, 2, 4
+
+STRICT, GROUP, RELAXED = "strict", "group", "relaxed"
+DURABILITY_MODES = (STRICT, GROUP, RELAXED)
+GROUP_INTERVAL = 0.005  # Longest an unawaited record waits for a background fsync, in seconds
+GROUP_SIZE = 64  # Pending records that trigger a background fsync straight away
+
+
+def _signature_bytes(value, width):
+    # Only canonical decimals round-trip through an integer unchanged
+    if not isinstance(value, str) or not value.isascii() or not value.isdigit() \
+            or (value[0] == "0" and value != "0") or len(value) > 3 * width:
+        return None
+    number = int(value)
+    return number.to_bytes(width, 'big') if number.bit_length() <= 8 * width else None
+
+
+def _partials_bytes(partials, width):
+    if not isinstance(partials, list) or len(partials) > 0xFFFF:
+        return None
+    parts = [U16.pack(len(partials))]
+    for partial in partials:
+        if not isinstance(partial, dict) or list(partial) != ["signature", "signed_by"] \
+                or not isinstance(partial["signed_by"], str):
+            return None
+        signature = _signature_bytes(partial["signature"], width)
+        signer = partial["signed_by"].encode('utf-8')
+        if signature is None or len(signer) > 0xFF:
+            return None
+        parts += [signature, bytes([len(signer)]), signer]
+    return b"".join(parts)
+
+
+def encode_frame(record, width=SIGNATURE_BYTES):
+    rest = dict(record)
+    flags = 0
+    parts = []
+    signature = _signature_bytes(record.get("signature"), width)
+    if signature is not None:
+        flags |= HAS_SIGNATURE
+        parts.append(signature)
+        rest["signature"] = None
+    partials = _partials_bytes(record.get("partial_signatures"), width)
+    if partials is not None:
+        flags |= HAS_PARTIALS
+        parts.append(partials)
+        rest["partial_signatures"] = None
+    if isinstance(record.get("record"), str):
+        text = record["record"].encode('utf-8')
+        flags |= HAS_TEXT
+        parts += [U32.pack(len(text)), text]
+        rest["record"] = None
+    body = bytes([flags]) + b"".join(parts) + json.dumps(rest, separators=(",", ":")).encode('utf-8')
+    return U32.pack(len(body)) + body
+
+
+def decode_frame(buf, offset, width):
+    """The record in the frame at offset of buf (bytes or mmap)"""
+    (length,) = U32.unpack_from(buf, offset)
+    pos, end = offset + U32.size, offset + U32.size + length
+    flags = buf[pos]
+    pos += 1
+    fields = {}
+    if flags & HAS_SIGNATURE:
+        fields["signature"] = str(int.from_bytes(buf[pos:pos + width], 'big'))
+        pos += width
+    if flags & HAS_PARTIALS:
+        (count,) = U16.unpack_from(buf, pos)
+        pos += U16.size
+        partials = []
+        for _ in range(count):
+            signature = str(int.from_bytes(buf[pos:pos + width], 'big'))
+            size = buf[pos + width]
+            pos += width + 1
+            partials.append({"signature": signature, "signed_by": buf[pos:pos + size].decode('utf-8')})
+            pos += size
+        fields["partial_signatures"] = partials
+    if flags & HAS_TEXT:
+        (size,) = U32.unpack_from(buf, pos)
+        pos += U32.size
+        fields["record"] = buf[pos:pos + size].decode('utf-8')
+        pos += size
+    record = json.loads(buf[pos:end])
+    record.update(fields)
+    return record
+
+
+def frame_ends(buf, offset, size):
+    """Yield (offset, end) for every complete frame from offset on"""
+    while offset + U32.size <= size:
+        (length,) = U32.unpack_from(buf, offset)
+        end = offset + U32.size + length
+        if end > size:
+            return  # Torn write at the end of the segment
+        yield offset, end
+        offset = end
+
+
+def read_json_frames(f):
+    """Records of a segment in the earlier layout: length-prefixed JSON frames"""
+    while True:
+        header = f.read(U32.size)
+        if len(header) < U32.size:
+            return
+        (length,) = U32.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length:
+            return
+        yield json.loads(payload)
+
+
+def fsync_dir(path):
+    """Make renames inside directory path durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    """Tracks which appended records are on stable storage.
+
+    Records are counted in ledger order. appended(count) notes that the first
+    count records have been handed to the OS, and durable(ticket) waits until
+    sync() has covered the first ticket records.
+    """
+
+    def __init__(self, mode, sync, group_interval=GROUP_INTERVAL, group_size=GROUP_SIZE, name="ledger"):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {', '.join(DURABILITY_MODES)}, not {mode!r}")
+        self.mode = mode
+        self.sync = sync
+        self.group_interval = group_interval
+        self.group_size = group_size
+        self.name = name
+        self.appended_count = 0  # Records written to the OS so far
+        self.durable_count = 0  # Records known to be on disk
+        self.syncs = 0  # fsyncs issued, for metrics
+        self.epoch = 0  # Bumped by reset(), so a sync in flight does not count
+        self.closed = False
+        self.cond = threading.Condition()
+        self._sync_lock = threading.Lock()  # One fsync at a time
+        self._thread = None
+
+    def reset(self, count):
+        """The ledger was reloaded or rewritten with count records, all on disk"""
+        with self.cond:
+            self.appended_count = self.durable_count = count
+            self.epoch += 1
+            self.cond.notify_all()
+
+    def appended(self, count):
+        """Note that the first count records have been written; returns the
+        ticket to wait on. Strict mode syncs before returning."""
+        with self.cond:
+            self.appended_count = max(self.appended_count, count)
+            if self.mode == GROUP:
+                if self._thread is None and not self.closed:
+                    self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.name}",
+                                                    daemon=True)
+                    self._thread.start()
+                self.cond.notify_all()
+        if self.mode == STRICT:
+            self.flush()
+        return count
+
+    def flush(self):
+        """Sync every record appended so far"""
+        with self._sync_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        # Call with _sync_lock held
+        with self.cond:
+            target, epoch = self.appended_count, self.epoch
+            if target <= self.durable_count:
+                return
+        self.sync()
+        with self.cond:
+            self.syncs += 1
+            if epoch == self.epoch:
+                self.durable_count = max(self.durable_count, target)
+            self.cond.notify_all()
+
+    def durable(self, ticket, timeout=None):
+        """Block until the record behind ticket is on disk; False on timeout,
+        and straight away in relaxed mode, which never syncs"""
+        if self.mode == RELAXED:
+            return False
+        if self.mode == GROUP:
+            # Leader/follower: whoever gets the sync lock syncs everything
+            # appended so far; the waiters queued behind it find their
+            # record covered, or lead the next sync together
+            if self._sync_lock.acquire(timeout=-1 if timeout is None else timeout):
+                try:
+                    with self.cond:
+                        covered = self.durable_count >= ticket
+                    if not covered:
+                        self._flush_locked()
+                finally:
+                    self._sync_lock.release()
+        with self.cond:
+            return self.cond.wait_for(lambda: self.durable_count >= ticket, timeout)
+
+    def _run(self):
+        # Backstop for records nobody waits on: sleep until something is
+        # pending, give waiters group_interval seconds to sync it (or until
+        # group_size records are pending), then cover what is left
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.closed or self.appended_count > self.durable_count)
+                if self.closed:
+                    return
+                deadline = time.monotonic() + self.group_interval
+                while not self.closed and self.appended_count - self.durable_count < self.group_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+            self.flush()
+
+    def close(self):
+        """Stop the group commit thread and sync whatever is still pending"""
+        with self.cond:
+            self.closed = True
+            thread, self._thread = self._thread, None
+            self.cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if self.mode != RELAXED:
+            self.flush()
+
+
+class NodeLedger:
+    def __init__(self, node, db_dir, durability=RELAXED, group_interval=GROUP_INTERVAL, group_size=GROUP_SIZE):
+        self.node = node
+        self.db_dir = db_dir
+        self.path = os.path.join(db_dir, f"node_{node.lower()}.ledger")
+        self.offsets_path = os.path.join(db_dir, f"node_{node.lower()}.offsets")
+        self.json_path = os.path.join(db_dir, f"node_{node.lower()}.json")
+        self.tail = deque(maxlen=TAIL_SIZE)
+        self.count = 0
+        self.bytes_read = 0  # Running I/O totals, for metrics
+        self.bytes_written = 0
+        self.lock = threading.RLock()
+        self.width = SIGNATURE_BYTES
+        self.offsets = array('Q')  # Frame positions, mirrored in node_x.offsets
+        self.size = 0  # End of the last complete frame
+        self._view = None  # Read-only mmap of the segment, remapped as it grows
+        self.durability = Durability(durability, self._sync, group_interval, group_size, name=node)
+
+        os.makedirs(db_dir, exist_ok=True)
+        if not os.path.exists(self.path):
+            self._write_segment(self._load_json_records())
+        elif not self._is_binary():
+            with open(self.path, 'rb') as f:
+                records = list(read_json_frames(f))
+            self._write_segment(records)
+        self._recover()
+        self._open()
+
+    def _load_json_records(self):
+        # Seed a fresh segment from the legacy JSON database, if there is one
+        if not os.path.exists(self.json_path):
+            return []
+        try:
+            with open(self.json_path, 'r') as f:
+                return json.load(f).get("records", [])
+        except (json.JSONDecodeError, AttributeError):
+            print(f"Warning: {self.json_path} contains invalid JSON, skipping.")
+            return []
+
+    def _is_binary(self):
+        with open(self.path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+    def _write_segment(self, records):
+        offsets = []
+        sync = self.durability.mode != RELAXED
+        with open(self.path + ".tmp", 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.width))
+            for record in records:
+                offsets.append(f.tell())
+                f.write(encode_frame(record, self.width))
+            self.bytes_written += f.tell()
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self.offsets_path + ".tmp", 'wb') as f:
+            f.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        # Without a table, recovery rescans whichever segment survives a crash
+        if os.path.exists(self.offsets_path):
+            os.remove(self.offsets_path)
+        os.replace(self.path + ".tmp", self.path)
+        os.replace(self.offsets_path + ".tmp", self.offsets_path)
+        if sync:
+            fsync_dir(self.db_dir)
+
+    def _recover(self):
+        # Load the offset table, then reconcile it with the segment: drop
+        # entries past a torn frame, index complete frames written after the
+        # table was last updated and cut off any partial frame
+        self._view = None
+        with open(self.path, 'rb') as f:
+            _, self.width = HEADER.unpack(f.read(HEADER.size))
+        offsets = array('Q')
+        data = b""
+        if os.path.exists(self.offsets_path):
+            with open(self.offsets_path, 'rb') as f:
+                data = f.read()
+            offsets.frombytes(data[:len(data) - len(data) % OFFSET.size])
+            if sys.byteorder == 'little':
+                offsets.byteswap()
+        changed = len(offsets) * OFFSET.size != len(data)
+        file_size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            while offsets and not any(frame_ends(view, offsets[-1], file_size)):
+                offsets.pop()
+                changed = True
+            start = HEADER.size
+            if offsets:
+                (length,) = U32.unpack_from(view, offsets[-1])
+                start = offsets[-1] + U32.size + length
+            self.size = start
+            for offset, end in frame_ends(view, start, file_size):
+                offsets.append(offset)
+                self.size = end
+                changed = True
+            self.offsets = offsets
+            self.count = len(offsets)
+            self.tail.clear()
+            for offset in offsets[-TAIL_SIZE:]:
+                self.tail.append(decode_frame(view, offset, self.width))
+        self.bytes_read += len(data) + file_size - start
+        if file_size != self.size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.size)
+        if changed:
+            table = array('Q', offsets)
+            if sys.byteorder == 'little':
+                table.byteswap()
+            with open(self.offsets_path, 'wb') as f:
+                f.write(table.tobytes())
+        self.durability.reset(self.count)
+
+    def _open(self):
+        self._file = open(self.path, 'ab')
+        self._offsets_file = open(self.offsets_path, 'ab')
+
+    def _sync(self):
+        # The group commit thread syncs while appends carry on, through its
+        # own descriptor in case replace() swaps the segment meanwhile
+        with self.lock:
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _mapped(self):
+        # Call with the lock held; maps are never closed explicitly, so a
+        # reader keeps its own until it is done with it
+        if self._view is None or len(self._view) < self.size:
+            self._file.flush()
+            with open(self.path, 'rb') as f:
+                self._view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._view
+
+    def append(self, record):
+        """Commit one record: a single append to the segment and its offset
+        table. Returns the ticket to pass to wait_durable()."""
+        frame = encode_frame(record, self.width)
+        with self.lock:
+            self._file.write(frame)
+            self._file.flush()
+            self._offsets_file.write(OFFSET.pack(self.size))
+            self._offsets_file.flush()
+            self.offsets.append(self.size)
+            self.size += len(frame)
+            self.tail.append(record)
+            self.count += 1
+            self.bytes_written += len(frame) + OFFSET.size
+            ticket = self.count
+        return self.durability.appended(ticket)
+
+    def wait_durable(self, ticket, timeout=None):
+        """The commit's acknowledgement: True once the appended record is on
+        disk, False on timeout or in relaxed mode"""
+        return self.durability.durable(ticket, timeout)
+
+    def records(self, start=0):
+        """Iterate over the committed records in ledger order, from index start"""
+        with self.lock:
+            view, offsets, count, width = self._mapped(), self.offsets, self.count, self.width
+        for index in range(start, count):
+            offset = offsets[index]
+            record = decode_frame(view, offset, width)
+            self.bytes_read += U32.unpack_from(view, offset)[0] + U32.size
+            yield record
+
+    def recent(self, limit=TAIL_SIZE):
+        with self.lock:
+            return list(self.tail)[-limit:]
+
+    def replace(self, records):
+        """Rewrite the whole segment (used by the legacy save_db path)"""
+        with self.lock:
+            self._close_files()
+            self._write_segment(records)
+            self._recover()
+            self._open()
+
+    def export(self):
+        return {"records": list(self.records())}
+
+    def export_json(self, path=None):
+        """Write the ledger out in the original node_x.json layout"""
+        path = path or self.json_path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.export(), f, indent=1)
+        os.replace(tmp_path, path)
+        return path
+
+    def _close_files(self):
+        self._view = None
+        self._file.close()
+        self._offsets_file.close()
+
+    def close(self):
+        self.durability.close()
+        self._close_files()
@@ -0,0 +1,276 @@
+"""SQLite storage backend for the node ledgers.
+
+With STORAGE_BACKEND = "sqlite", every node's ledger lives in one SQLite
+database in WAL mode (database/ledger.sqlite3) instead of node_x.ledger
+segments. SQLiteLedger has NodeLedger's interface, so get_db, save_db and
+append_db work unchanged. Each append and each save_db rewrite is a single
+transaction, so a crash leaves either the old ledger or the new one.
+
+Rows carry the record's ledger position, sequence number, item_id and node
+prefix (the "A" of "A:item:quantity:price"), each indexed per node, and an
+FTS5 trigram index covers the record text. SQLItemIndex and SQLRecordIndex
+answer the same queries as the in-memory ItemIndex and RecordIndex with
+indexed SQL.
+
+Durability modes work as for segments. SQLite runs with synchronous=NORMAL,
+which leaves WAL commits in the page cache. A commit is durable once its WAL
+frames are on disk, so strict and group mode fsync the -wal file, per
+append or per group.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from node_ledger.ledger import NodeLedger, Durability, TAIL_SIZE, RELAXED, GROUP_INTERVAL, GROUP_SIZE
+
+DB_NAME = "ledger.sqlite3"
+PAGE_SIZE = 256  # Rows fetched per query when iterating
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    node TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sequence INTEGER,
+    item_id TEXT,
+    prefix TEXT,
+    text TEXT,
+    body TEXT NOT NULL,
+    UNIQUE (node, position)
+);
+CREATE INDEX IF NOT EXISTS records_sequence ON records (node, sequence);
+CREATE INDEX IF NOT EXISTS records_item ON records (node, item_id, position);
+CREATE INDEX IF NOT EXISTS records_prefix ON records (node, prefix, position);
+"""
+
+# Substring search; needs SQLite 3.34+ for the trigram tokenizer
+TEXT_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_text USING fts5(
+    text, content='records', content_rowid='id', tokenize='trigram case_sensitive 1');
+CREATE TRIGGER IF NOT EXISTS records_text_insert AFTER INSERT ON records BEGIN
+    INSERT INTO records_text (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS records_text_delete AFTER DELETE ON records BEGIN
+    INSERT INTO records_text (records_text, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def _columns(record):
+    """(sequence, item_id, prefix, text) for a record's indexed columns"""
+    text = record.get("record") if isinstance(record, dict) else None
+    if not isinstance(text, str):
+        text = None
+    parts = text.split(":") if text else []
+    sequence = record.get("sequence")
+    if isinstance(sequence, bool) or not isinstance(sequence, (int, float, str)):
+        sequence = None
+    return (sequence, parts[1] if len(parts) >= 2 else None, parts[0] if len(parts) >= 2 else None, text)
+
+
+class SQLiteLedger(NodeLedger):
+    def __init__(self, node, db_dir, durability=RELAXED, group_interval=GROUP_INTERVAL, group_size=GROUP_SIZE):
+        self.node = node
+        self.db_dir = db_dir
+        self.path = os.path.join(db_dir, DB_NAME)
+        self.segment_path = os.path.join(db_dir, f"node_{node.lower()}.ledger")
+        self.json_path = os.path.join(db_dir, f"node_{node.lower()}.json")
+        self.tail = deque(maxlen=TAIL_SIZE)
+        self.bytes_read = 0  # Running I/O totals, for metrics
+        self.bytes_written = 0
+        self.lock = threading.RLock()
+        self.durability = Durability(durability, self._sync, group_interval, group_size, name=node)
+
+        os.makedirs(db_dir, exist_ok=True)
+        # Autocommit mode: every write below runs in an explicit transaction
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(TEXT_INDEX)
+        except sqlite3.OperationalError:
+            pass  # No trigram tokenizer; search falls back to instr()
+        self.text_index = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'records_text'").fetchone() is not None
+
+        self._recover()
+        if self.count == 0:
+            self.replace(self._seed_records())
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _seed_records(self):
+        # Migrate an existing segment ledger, else seed from node_x.json
+        if os.path.exists(self.segment_path):
+            segment = NodeLedger(self.node, self.db_dir)
+            records = list(segment.records())
+            segment.close()
+            return records
+        return self._load_json_records()
+
+    def _recover(self):
+        with self.lock:
+            (self.count,) = self.conn.execute(
+                "SELECT COUNT(*) FROM records WHERE node = ?", (self.node,)).fetchone()
+            rows = self.conn.execute(
+                "SELECT body FROM records WHERE node = ? ORDER BY position DESC LIMIT ?",
+                (self.node, TAIL_SIZE)).fetchall()
+        self.tail.clear()
+        self.tail.extend(json.loads(body) for (body,) in reversed(rows))
+        self.durability.reset(self.count)
+
+    def _sync(self):
+        # No -wal file means a checkpoint moved everything into the database,
+        # and checkpoints sync under synchronous=NORMAL
+        try:
+            fd = os.open(self.path + "-wal", os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _insert(self, position, record):
+        body = json.dumps(record, separators=(",", ":"))
+        self.conn.execute(
+            "INSERT INTO records (node, position, sequence, item_id, prefix, text, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.node, position, *_columns(record), body))
+        self.bytes_written += len(body)
+
+    def append(self, record):
+        """Commit one record: one single-row transaction. Returns the ticket
+        to pass to wait_durable()."""
+        with self.lock:
+            with self._transaction():
+                self._insert(self.count, record)
+            self.count += 1
+            self.tail.append(record)
+            ticket = self.count
+        return self.durability.appended(ticket)
+
+    def _select(self, where, params, after=-1):
+        """Iterate over (position, record) for rows past position after that
+        match where, in ledger order, a page of rows at a time"""
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT position, body FROM records WHERE node = ? AND position > ? AND {where} "
+                    "ORDER BY position LIMIT ?", (self.node, after, *params, PAGE_SIZE)).fetchall()
+            for position, body in rows:
+                self.bytes_read += len(body)
+                yield position, json.loads(body)
+            if len(rows) < PAGE_SIZE:
+                return
+            after = rows[-1][0]
+
+    def records(self, start=0):
+        """Iterate over the committed records in ledger order, from index start"""
+        for _, record in self._select("1", (), start - 1):
+            yield record
+
+    def replace(self, records):
+        """Rewrite the whole ledger in one transaction"""
+        with self._transaction():
+            self.conn.execute("DELETE FROM records WHERE node = ?", (self.node,))
+            for position, record in enumerate(records):
+                self._insert(position, record)
+        if self.durability.mode != RELAXED:
+            self._sync()
+        self._recover()
+
+    def scan_item(self, item_id, after=-1):
+        """(position, record) for every record of item_id after position after"""
+        return self._select("item_id = ?", (item_id,), after)
+
+    def search(self, text):
+        """Records whose text contains text, in ledger order"""
+        if self.text_index and len(text) >= 3:
+            phrase = '"' + text.replace('"', '""') + '"'
+            where = "id IN (SELECT rowid FROM records_text WHERE records_text MATCH ?) AND instr(text, ?) > 0"
+            return [record for _, record in self._select(where, (phrase, text))]
+        return [record for _, record in self._select("instr(text, ?) > 0", (text,))]
+
+    def has_sequence(self, sequence):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM records WHERE node = ? AND sequence IS ? LIMIT 1",
+                                     (self.node, sequence)).fetchone() is not None
+
+    def close(self):
+        self.durability.close()
+        with self.lock:
+            self.conn.close()
+
+
+class SQLItemIndex:
+    """ItemIndex's interface over an SQLiteLedger; lookups are indexed SQL"""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._records = None
+
+    @property
+    def records(self):
+        # Only consensus bookkeeping needs every record; loaded once, then kept current by add()
+        with self.ledger.lock:
+            if self._records is None:
+                self._records = list(self.ledger.records())
+            return self._records
+
+    def add(self, record):
+        # The ledger append already indexed the row
+        with self.ledger.lock:
+            if self._records is not None:
+                self._records.append(record)
+
+    def lookup(self, item_id=None):
+        if not item_id:
+            return self.records
+        return [record for _, record in self.ledger.scan_item(item_id)]
+
+    def scan(self, item_id=None, after=-1):
+        if not item_id:
+            return ((position, record) for position, record in
+                    enumerate(self.ledger.records(after + 1), start=after + 1))
+        return self.ledger.scan_item(item_id, after)
+
+    def __len__(self):
+        return self.ledger.count
+
+
+class SQLRecordIndex:
+    """RecordIndex's interface over an SQLiteLedger"""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def add(self, record):
+        pass  # The ledger append already indexed the row
+
+    def search(self, query):
+        return self.ledger.search(query)
+
+    def has_sequence(self, sequence):
+        return self.ledger.has_sequence(sequence)
+
+    def __len__(self):
+        return self.ledger.count
+
+
+def open_ledger(node, db_dir, backend, durability=RELAXED, group_interval=GROUP_INTERVAL, group_size=GROUP_SIZE):
+    """A node's ledger in the configured storage backend ("segment" or "sqlite")
+    and durability mode ("strict", "group" or "relaxed")"""
+    ledger_class = SQLiteLedger if backend == "sqlite" else NodeLedger
+    return ledger_class(node, db_dir, durability, group_interval, group_size)